@@ -0,0 +1,309 @@
+"""
+EXPLAIN plans and timings of the dashboard and list queries, with and
+without the hot path indexes (sales 0009, inventory 0007).
+
+Seeds a throwaway database with a realistic spread of invoices, receipts,
+quotations, purchase orders and products, runs ANALYZE, then for each
+query records the plan and the median time over --repeat runs, first
+with those indexes dropped and then with them in place.
+
+    python benchmarks/query_plans.py --scale 1 --output plans.md
+
+Runs on a temporary SQLite file; set DATABASE_URL to an empty scratch
+database (e.g. a local PostgreSQL) to measure there instead. The data
+is written into it, so never point it at a real one.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# (app label, model name, index name) of the indexes being measured
+HOT_PATH_INDEXES = [
+    ("sales", "Invoice", "sales_invoice_status_date_idx"),
+    ("sales", "Invoice", "sales_invoice_open_idx"),
+    ("sales", "PurchaseOrder", "sales_po_status_date_idx"),
+    ("sales", "Quotation", "sales_quote_status_date_idx"),
+    ("inventory", "Product", "inv_product_low_stock_idx"),
+]
+
+
+def setup(db_path):
+    sys.path.insert(0, str(ROOT))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+
+    import django
+    from django.conf import settings
+
+    if not os.environ.get("DATABASE_URL"):
+        settings.DATABASES["default"]["NAME"] = db_path
+    django.setup()
+
+
+@contextmanager
+def raw_dates(*models):
+    """Let bulk_create() write the seeded dates instead of auto_now_add's today."""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, "auto_now_add", False)
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def day_time(value):
+    from django.utils import timezone
+
+    return timezone.make_aware(datetime(value.year, value.month, value.day))
+
+
+def seed(scale):
+    from crm.models import Customer, Supplier
+    from inventory.models import Product
+    from sales.models import Invoice, PurchaseOrder, Quotation, Receipt
+
+    rng = random.Random(42)
+    today = date.today()
+    batch = 2000
+
+    def day():
+        return today - timedelta(days=rng.randrange(3 * 365))
+
+    sizes = {
+        "customers": 2000 * scale,
+        "suppliers": 200 * scale,
+        "products": 20000 * scale,
+        "quotations": 50000 * scale,
+        "invoices": 100000 * scale,
+        "purchase orders": 20000 * scale,
+    }
+
+    with raw_dates(Customer, Supplier, Product, Quotation, Invoice, PurchaseOrder, Receipt):
+        Customer.objects.bulk_create(
+            [Customer(name=f"Customer {n}", created_at=day_time(day())) for n in range(sizes["customers"])],
+            batch_size=batch,
+        )
+        Supplier.objects.bulk_create(
+            [Supplier(name=f"Supplier {n}", created_at=day_time(day())) for n in range(sizes["suppliers"])],
+            batch_size=batch,
+        )
+        customer_ids = list(Customer.objects.values_list("id", flat=True))
+        supplier_ids = list(Supplier.objects.values_list("id", flat=True))
+
+        products = []
+        for _ in range(sizes["products"]):
+            product = Product(
+                animal_type=rng.choice(Product.ANIMAL_CHOICES)[0],
+                meat_type=rng.choice(Product.MEAT_CHOICES)[0],
+                weight_kg=Decimal(rng.randrange(50, 2000)) / 100,
+                cost_price_per_kg=Decimal(rng.randrange(200, 800)) / 100,
+                selling_price_per_kg=Decimal(rng.randrange(800, 1500)) / 100,
+                # ~2% at or below the low stock threshold
+                stock=rng.randrange(0, 6) if rng.random() < 0.02 else rng.randrange(6, 300),
+                created_at=day_time(day()),
+            )
+            product.code_prefix = product.code.hex[:8]
+            products.append(product)
+        Product.objects.bulk_create(products, batch_size=batch)
+
+        Quotation.objects.bulk_create(
+            [
+                Quotation(
+                    customer_id=rng.choice(customer_ids), date=day(), number=f"QUO-{n:07d}",
+                    status=rng.choices(["Draft", "Sent", "Accepted", "Rejected"], [5, 10, 70, 15])[0],
+                    total_amount=rng.randrange(100, 100000),
+                )
+                for n in range(sizes["quotations"])
+            ],
+            batch_size=batch,
+        )
+        PurchaseOrder.objects.bulk_create(
+            [
+                PurchaseOrder(
+                    supplier_id=rng.choice(supplier_ids), date=day(),
+                    status="Pending" if rng.random() < 0.1 else "Received",
+                    total_amount=rng.randrange(1000, 500000),
+                )
+                for _ in range(sizes["purchase orders"])
+            ],
+            batch_size=batch,
+        )
+
+        invoices = []
+        for n in range(sizes["invoices"]):
+            total = Decimal(rng.randrange(100, 100000))
+            status = rng.choices(["Paid", "Unpaid", "Partially Paid", "Cancelled"], [70, 15, 10, 5])[0]
+            received = {"Paid": total, "Partially Paid": total / 2}.get(status, Decimal(0))
+            invoices.append(Invoice(
+                customer_id=rng.choice(customer_ids), date=day(), number=f"INV-{n:07d}",
+                status=status, total_amount=total, amount_received=received, balance_due=total - received,
+            ))
+        Invoice.objects.bulk_create(invoices, batch_size=batch)
+
+        receipts = [
+            Receipt(
+                invoice_id=invoice.pk, date=min(invoice.date + timedelta(days=rng.randrange(30)), today),
+                number=f"REC-{n:07d}", amount_paid=invoice.amount_received,
+            )
+            for n, invoice in enumerate(
+                Invoice.objects.filter(amount_received__gt=0).only("id", "date", "amount_received").iterator()
+            )
+        ]
+        Receipt.objects.bulk_create(receipts, batch_size=batch)
+        sizes["receipts"] = len(receipts)
+
+    return sizes
+
+
+def queries():
+    from django.db.models import Sum
+    from django.db.models.functions import TruncMonth
+
+    from crm.models import Customer
+    from inventory.models import Product
+    from sales.models import Invoice, PurchaseOrder, Quotation, Receipt
+
+    year_ago = date.today().replace(day=1) - timedelta(days=365)
+    two_years_ago = date.today() - timedelta(days=730)  # a deep ?cursor= page
+    page = 51  # core.pagination's default page size, plus the "is there more" row
+
+    return [
+        ("dashboard: low stock",
+         lambda: Product.objects.filter(stock__lte=Product.LOW_STOCK).order_by("stock")[:5]),
+        ("dashboard: recent invoices",
+         lambda: Invoice.objects.prefetch_related("customer").order_by("-date", "-id")[:5]),
+        ("dashboard: recent quotations",
+         lambda: Quotation.objects.prefetch_related("customer").order_by("-date", "-id")[:5]),
+        ("dashboard: recent receipts",
+         lambda: Receipt.objects.select_related("invoice__customer").order_by("-date", "-id")[:5]),
+        ("receipts by month, last 12 months",
+         lambda: Receipt.objects.filter(date__gte=year_ago)
+         .annotate(month=TruncMonth("date")).values("month")
+         .annotate(total=Sum("amount_paid")).order_by("month")),
+        ("invoice list",
+         lambda: Invoice.objects.select_related("customer").order_by("-date", "-pk")[:page]),
+        ("invoice list ?status=Unpaid",
+         lambda: Invoice.objects.select_related("customer").filter(status="Unpaid").order_by("-date", "-pk")[:page]),
+        ("invoice list ?status=Unpaid, two years back",
+         lambda: Invoice.objects.select_related("customer").filter(status="Unpaid", date__lt=two_years_ago)
+         .order_by("-date", "-pk")[:page]),
+        ("open invoices",
+         lambda: Invoice.objects.filter(status__in=Invoice.OPEN_STATUSES).order_by("-date", "-pk")[:page]),
+        ("receipt list",
+         lambda: Receipt.objects.select_related("invoice__customer").order_by("-date", "-pk")[:page]),
+        ("purchase order list ?status=Pending",
+         lambda: PurchaseOrder.objects.select_related("supplier").filter(status="Pending").order_by("-date", "-pk")[:page]),
+        ("purchase order list ?status=Pending, two years back",
+         lambda: PurchaseOrder.objects.select_related("supplier").filter(status="Pending", date__lt=two_years_ago)
+         .order_by("-date", "-pk")[:page]),
+        ("pending quotations",
+         lambda: Quotation.objects.filter(status__in=["Draft", "Sent"]).order_by("-date", "-pk")[:page]),
+        ("pending quotations, two years back",
+         lambda: Quotation.objects.filter(status__in=["Draft", "Sent"], date__lt=two_years_ago)
+         .order_by("-date", "-pk")[:page]),
+        ("product list",
+         lambda: Product.objects.order_by("-created_at", "-pk")[:page]),
+        ("customer list",
+         lambda: Customer.objects.order_by("-created_at", "-pk")[:page]),
+    ]
+
+
+def measure(repeat):
+    results = {}
+    for name, build in queries():
+        plan = build().explain()
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            list(build())
+            timings.append((time.perf_counter() - start) * 1000)
+        results[name] = (plan, statistics.median(timings))
+    return results
+
+
+def set_indexes(present):
+    from django.apps import apps
+    from django.db import connection
+
+    with connection.schema_editor() as editor:
+        for app_label, model_name, index_name in HOT_PATH_INDEXES:
+            model = apps.get_model(app_label, model_name)
+            index = next(i for i in model._meta.indexes if i.name == index_name)
+            if present:
+                editor.add_index(model, index)
+            else:
+                editor.remove_index(model, index)
+    analyze()
+
+
+def analyze():
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=1, help="Multiplies the seeded row counts.")
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per query; the median is reported.")
+    parser.add_argument("--output", help="Also write the report to this file.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup(os.path.join(tmp, "plans.sqlite3"))
+
+        from django.core.management import call_command
+        from django.db import connection
+
+        call_command("migrate", verbosity=0)
+        start = time.perf_counter()
+        sizes = seed(args.scale)
+        seeded = time.perf_counter() - start
+
+        set_indexes(False)
+        without = measure(args.repeat)
+        set_indexes(True)
+        with_indexes = measure(args.repeat)
+
+        lines = [
+            f"# Query plans ({connection.vendor}, seeded in {seeded:.0f} s)",
+            "",
+            ", ".join(f"{count} {name}" for name, count in sizes.items()),
+            "",
+            "| query | without (ms) | with (ms) |",
+            "| --- | ---: | ---: |",
+        ]
+        for name, (_, ms) in without.items():
+            lines.append(f"| {name} | {ms:.2f} | {with_indexes[name][1]:.2f} |")
+        for name, (plan, _) in with_indexes.items():
+            lines += ["", f"## {name}", "", "without:", "", indent(without[name][0]), "", "with:", "", indent(plan)]
+        report = "\n".join(lines) + "\n"
+
+        connection.close()
+
+    print(report)
+    if args.output:
+        Path(args.output).write_text(report, encoding="utf-8")
+
+
+def indent(text):
+    return "\n".join(f"    {line}" for line in text.splitlines())
+
+
+if __name__ == "__main__":
+    main()
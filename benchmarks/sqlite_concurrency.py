@@ -0,0 +1,155 @@
+"""
+Read/write throughput of the SQLite profile under concurrent load.
+
+Runs the same workload against a fresh database twice, once with SQLite's
+defaults (rollback journal, deferred transactions, 5 s timeout) and once
+with the profile from core.settings (WAL, tuned pragmas, BEGIN IMMEDIATE):
+
+    writers  record receipts against open invoices, as tills do
+             (each one also moves the invoice balance and sales rollups)
+    readers  count unpaid invoices and read the latest receipts, as the
+             dashboard and list pages do
+
+Each profile runs in its own process so the settings are read fresh, and
+every writer and reader is a process of its own.
+
+    python benchmarks/sqlite_concurrency.py --seconds 10 --writers 4 --readers 8
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+PROFILES = ("default", "tuned")
+
+
+def setup(profile, db_path):
+    sys.path.insert(0, str(ROOT))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+
+    import django
+    from django.apps import apps
+    from django.conf import settings
+
+    if apps.ready:
+        return
+    database = settings.DATABASES["default"]
+    database["NAME"] = db_path
+    if profile == "default":
+        database["OPTIONS"] = {"init_command": "PRAGMA journal_mode=DELETE"}
+    django.setup()
+
+
+def work(role, n, profile, db_path, stop, invoice_ids, results):
+    setup(profile, db_path)
+
+    from django.db import OperationalError, connection, transaction
+
+    from sales.models import Invoice, Receipt
+
+    done = errors = 0
+    i = n
+    while time.time() < stop:
+        try:
+            if role == "writes":
+                with transaction.atomic():
+                    Receipt.objects.create(invoice_id=invoice_ids[i % len(invoice_ids)], amount_paid=1)
+            else:
+                Invoice.objects.filter(status__in=["Unpaid", "Partially Paid"]).count()
+                list(Receipt.objects.order_by("-date", "-id")[:50])
+            done += 1
+        except OperationalError:
+            errors += 1
+        i += 1
+    connection.close()
+    results.put((role, done, errors))
+
+
+def run_profile(profile, db_path, seconds, writers, readers):
+    setup(profile, db_path)
+
+    from django.core.management import call_command
+    from django.db import connection
+
+    from crm.models import Customer
+    from sales.models import Invoice
+
+    call_command("migrate", verbosity=0)
+    customer = Customer.objects.create(name="Benchmark")
+    invoice_ids = [
+        Invoice.objects.create(customer=customer, total_amount=1_000_000).pk for _ in range(20)
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA journal_mode")
+        journal_mode = cursor.fetchone()[0]
+    connection.close()
+
+    # Processes, not threads: each worker has its own connection and GIL,
+    # like the web server's worker processes.
+    results = multiprocessing.Queue()
+    stop = time.time() + 2 + seconds  # 2 s for the workers to start
+    roles = ["writes"] * writers + ["reads"] * readers
+    workers = [
+        multiprocessing.Process(
+            target=work, args=(role, n, profile, db_path, stop, invoice_ids, results)
+        )
+        for n, role in enumerate(roles)
+    ]
+    for worker in workers:
+        worker.start()
+
+    counts = {"writes": 0, "reads": 0, "errors": 0}
+    for _ in workers:
+        role, done, errors = results.get()
+        counts[role] += done
+        counts["errors"] += errors
+    for worker in workers:
+        worker.join()
+    return {"profile": profile, "journal_mode": journal_mode, "seconds": seconds, **counts}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--profile", choices=PROFILES, help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.profile:
+        print(json.dumps(run_profile(args.profile, args.db, args.seconds, args.writers, args.readers)))
+        return
+
+    print(f"{args.writers} writer(s), {args.readers} reader(s), {args.seconds:g} s per profile\n")
+    print(f"{'profile':<8} {'journal':<8} {'writes/s':>10} {'reads/s':>10} {'errors':>8}")
+    for profile in PROFILES:
+        with tempfile.TemporaryDirectory() as tmp:
+            output = subprocess.run(
+                [
+                    sys.executable, __file__,
+                    "--profile", profile,
+                    "--db", os.path.join(tmp, "bench.sqlite3"),
+                    "--seconds", str(args.seconds),
+                    "--writers", str(args.writers),
+                    "--readers", str(args.readers),
+                ],
+                check=True, capture_output=True, text=True,
+            ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(
+            f"{profile:<8} {result['journal_mode']:<8} "
+            f"{result['writes'] / args.seconds:>10.0f} {result['reads'] / args.seconds:>10.0f} "
+            f"{result['errors']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,91 @@
-# crm/admin.py
+"""
+Shared pieces for the apps' ModelAdmins on big tables.
+
+The stock changelist runs a full COUNT(*) for the paginator and another
+for "show all", and its search is icontains over every search field.
+EstimatedCountAdmin counts at most a bounded number of rows and, past
+that, shows the planner's row estimate for the table (PostgreSQL
+pg_class.reltuples, SQLite sqlite_stat1 after ANALYZE). FullTextSearchAdmin
+answers the search box, and the autocomplete widgets that use it, from
+core.fulltext where the model is indexed there.
+"""
 from django.contrib import admin
-from .models import Customer, Supplier
+from django.core.paginator import EmptyPage, Paginator
+from django.db import DatabaseError, connections
+from django.utils.functional import cached_property
+
+from . import fulltext
+
+
+def estimated_rows(model, using="default"):
+    """The database's estimate of the table's row count, or None."""
+    connection = connections[using]
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+                row = cursor.fetchone()
+                return row[0] if row and row[0] >= 0 else None
+            if connection.vendor == "sqlite":
+                cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+                row = cursor.fetchone()
+                return int(row[0].split()[0]) if row else None
+    except DatabaseError:  # no sqlite_stat1 before the first ANALYZE
+        return None
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Past count_limit rows the count is only a floor (the estimate, or
+    count_limit + 1 when filtered or not analyzed), so later pages are
+    still served: page() reads one row ahead and stretches the count
+    whenever there is more than it allowed for.
+    """
+    count_limit = 10000
+    exact = True
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        counted = queryset.order_by().values("pk")[:self.count_limit + 1].count()
+        if counted <= self.count_limit:
+            return counted
+        self.exact = False
+        estimate = estimated_rows(queryset.model, queryset.db) if not queryset.query.has_filters() else None
+        return max(estimate or 0, counted)
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if self.exact or int(number) < 1:
+                raise
+            return int(number)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if self.exact:
+            return super().page(number)
+
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage(self.error_messages["no_results"])
+        if bottom + len(rows) > self.count:
+            self.__dict__["count"] = bottom + len(rows)
+            self.__dict__.pop("num_pages", None)
+        return self._get_page(rows[:self.per_page], number, self)
+
+
+class EstimatedCountAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
 
-admin.site.register(Customer)
-admin.site.register(Supplier)
+class FullTextSearchAdmin(EstimatedCountAdmin):
+    def get_search_results(self, request, queryset, search_term):
+        if search_term and fulltext.enabled(queryset.db) and fulltext.kind_of(self.model):
+            return fulltext.filter_matching(queryset, search_term), False
+        return super().get_search_results(request, queryset, search_term)
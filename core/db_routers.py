@@ -0,0 +1,132 @@
+"""
+Sending reporting reads to a replica.
+
+Views marked @reporting (the dashboard, summaries, lists and exports)
+read from REPLICA_DATABASE when one is configured; everything else, and
+every write, uses "default". ReplicaMiddleware switches the routing on
+for GET/HEAD requests to those views, including while a streamed export
+is being sent.
+
+Read your writes: a request that writes anything through the ORM pins
+that browser to the primary for REPLICA_PIN_SECONDS with a cookie, so a
+user who has just posted a receipt sees it on the receipt list even if
+the replica is a moment behind.
+
+The replica can be a PostgreSQL standby or, locally, a second SQLite
+file kept in step by whatever copies the primary (it is never migrated
+by manage.py migrate).
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_COOKIE = "db_primary_until"
+
+# Who is signed in and what they may do always comes from the primary:
+# a session created a moment ago may not have reached the replica yet.
+PRIMARY_APPS = {"auth", "contenttypes", "sessions"}
+
+_use_replica = ContextVar("use_replica", default=False)
+_wrote = ContextVar("wrote", default=False)
+
+
+def reporting(view_func):
+    """Mark a read-only view whose queries may run on the replica."""
+    view_func.reporting = True
+    return view_func
+
+
+def replica_alias():
+    return getattr(settings, "REPLICA_DATABASE", None)
+
+
+@contextmanager
+def primary():
+    """Read from the primary inside the block, e.g. before caching a result."""
+    token = _use_replica.set(False)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and model._meta.app_label not in PRIMARY_APPS:
+            return replica_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if replica_alias() and db == replica_alias():
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.use_replica = False
+        replica = _use_replica.set(False)
+        wrote = _wrote.set(False)
+        try:
+            response = self.get_response(request)
+            if _wrote.get():
+                until = int(time.time()) + settings.REPLICA_PIN_SECONDS
+                response.set_cookie(
+                    PIN_COOKIE, str(until), max_age=settings.REPLICA_PIN_SECONDS,
+                    httponly=True, samesite="Lax",
+                )
+        finally:
+            _wrote.reset(wrote)
+            _use_replica.reset(replica)
+
+        if request.use_replica and response.streaming:
+            response.streaming_content = self._on_replica(response.streaming_content)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Switched on here, where the view is known, and off again in __call__.
+        if (
+            replica_alias()
+            and getattr(view_func, "reporting", False)
+            and request.method in ("GET", "HEAD")
+            and not self._pinned(request)
+        ):
+            request.use_replica = True
+            _use_replica.set(True)
+
+    @staticmethod
+    def _pinned(request):
+        try:
+            return int(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+    @staticmethod
+    def _on_replica(content):
+        """Stream `content`, producing each chunk with replica reads switched on."""
+        chunks = iter(content)
+        while True:
+            token = _use_replica.set(True)
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+            finally:
+                _use_replica.reset(token)
+            yield chunk
@@ -0,0 +1,199 @@
+"""
+CSV / XLSX exports of the list views, for the accountant.
+
+Rows are read with .iterator(chunk_size=EXPORT_CHUNK_SIZE), through a
+server-side cursor on PostgreSQL, and, for CSV, written straight into a
+StreamingHttpResponse, so memory stays flat however many rows there are.
+XLSX needs openpyxl (optional): its write-only workbook spools rows to
+disk and the finished file is then streamed from there.
+
+Filters follow the list pages: ?start=&end= (ISO dates) on the list's date
+column and ?status= where the model has one.
+
+Text that starts like a formula (= + - @, tab or CR) gets a leading
+apostrophe, so a customer named "=HYPERLINK(...)" opens in a spreadsheet
+as text rather than being evaluated.
+"""
+import csv
+import tempfile
+import uuid
+from datetime import date, datetime
+from operator import attrgetter
+
+from django.conf import settings
+from django.db.models import DateTimeField
+from django.utils import timezone
+
+from crm.models import Customer, Supplier
+from inventory.models import Product
+from sales.models import Invoice, PurchaseOrder, Quotation, Receipt
+
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+class Export:
+    def __init__(self, model, date_field, columns, select_related=(), title=None):
+        self.model = model
+        self.date_field = date_field
+        self.columns = columns  # [(header, attribute path)]
+        self.select_related = select_related
+        self.title = title or model._meta.verbose_name_plural.title()
+
+    @property
+    def has_status(self):
+        return any(f.name == "status" for f in self.model._meta.fields)
+
+    def queryset(self, params):
+        queryset = self.model.objects.select_related(*self.select_related)
+        lookup = self.date_field
+        if isinstance(self.model._meta.get_field(self.date_field), DateTimeField):
+            lookup = f"{self.date_field}__date"
+
+        start = _parse_date(params.get("start"))
+        end = _parse_date(params.get("end"))
+        if start:
+            queryset = queryset.filter(**{f"{lookup}__gte": start})
+        if end:
+            queryset = queryset.filter(**{f"{lookup}__lte": end})
+        if self.has_status and params.get("status"):
+            queryset = queryset.filter(status=params["status"])
+
+        return queryset.order_by(f"-{self.date_field}", "-pk")
+
+    def rows(self, params):
+        getters = [attrgetter(path) for _, path in self.columns]
+        for obj in self.queryset(params).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+            yield [_cell(_get(getter, obj)) for getter in getters]
+
+    @property
+    def headers(self):
+        return [header for header, _ in self.columns]
+
+
+EXPORTS = {
+    "invoices": Export(Invoice, "date", [
+        ("Number", "number"),
+        ("Date", "date"),
+        ("Customer", "customer.name"),
+        ("Quotation", "quotation.number"),
+        ("Status", "status"),
+        ("Total", "total_amount"),
+        ("Received", "amount_received"),
+        ("Balance due", "balance_due"),
+    ], select_related=("customer", "quotation")),
+    "receipts": Export(Receipt, "date", [
+        ("Number", "number"),
+        ("Date", "date"),
+        ("Invoice", "invoice.number"),
+        ("Customer", "invoice.customer.name"),
+        ("Amount paid", "amount_paid"),
+        ("Payment method", "payment_method"),
+        ("Notes", "notes"),
+    ], select_related=("invoice__customer",)),
+    "quotations": Export(Quotation, "date", [
+        ("Number", "number"),
+        ("Date", "date"),
+        ("Customer", "customer.name"),
+        ("Status", "status"),
+        ("Total", "total_amount"),
+    ], select_related=("customer",)),
+    "purchase-orders": Export(PurchaseOrder, "date", [
+        ("PO", "id"),
+        ("Date", "date"),
+        ("Supplier", "supplier.name"),
+        ("Status", "status"),
+        ("Total", "total_amount"),
+    ], select_related=("supplier",), title="Purchase Orders"),
+    "products": Export(Product, "created_at", [
+        ("Code", "code"),
+        ("Animal", "animal_type"),
+        ("Meat", "meat_type"),
+        ("Weight (kg)", "weight_kg"),
+        ("Cost/kg", "cost_price_per_kg"),
+        ("Price/kg", "selling_price_per_kg"),
+        ("Total price", "total_selling_price"),
+        ("Stock", "stock"),
+        ("Packed", "created_at"),
+    ]),
+    "customers": Export(Customer, "created_at", [
+        ("Name", "name"),
+        ("Email", "email"),
+        ("Phone", "phone"),
+        ("Address", "address"),
+        ("Created", "created_at"),
+    ]),
+    "suppliers": Export(Supplier, "created_at", [
+        ("Name", "name"),
+        ("Company", "company"),
+        ("Email", "email"),
+        ("Phone", "phone"),
+        ("Address", "address"),
+        ("Created", "created_at"),
+    ]),
+}
+
+
+def _parse_date(value):
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def _get(getter, obj):
+    try:
+        return getter(obj)
+    except AttributeError:  # a None foreign key on the way
+        return None
+
+
+def _cell(value):
+    if isinstance(value, datetime):
+        value = timezone.localtime(value).replace(tzinfo=None) if timezone.is_aware(value) else value
+        return value.replace(microsecond=0)
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+class _Echo:
+    """File-like object that hands back what csv.writer writes."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(export, params, buffer_size=64 * 1024):
+    """CSV text in chunks of about `buffer_size` characters."""
+    writer = csv.writer(_Echo())
+    chunk = ["\ufeff", writer.writerow(export.headers)]  # BOM: Excel reads it as UTF-8
+    size = 0
+    for row in export.rows(params):
+        line = writer.writerow(["" if value is None else value for value in row])
+        chunk.append(line)
+        size += len(line)
+        if size >= buffer_size:
+            yield "".join(chunk)
+            chunk, size = [], 0
+    yield "".join(chunk)
+
+
+def xlsx_file(export, params):
+    """The export as an .xlsx in a temporary file, or None without openpyxl."""
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        return None
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(export.title[:31])
+    sheet.append(export.headers)
+    for row in export.rows(params):
+        sheet.append(row)
+
+    output = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    workbook.save(output)
+    output.seek(0)
+    return output
@@ -0,0 +1,212 @@
+"""
+Full-text search over customers, suppliers and products.
+
+On SQLite the searchable fields of each row are mirrored into one FTS5
+table, search_index, and matched as prefix queries ranked by bm25. On
+other databases, or an SQLite built without FTS5, search() falls back to
+icontains over the same fields with names starting with the query first.
+crm.signals and inventory.signals keep the index in step with the rows;
+the rebuild_search_index command refills it from scratch.
+
+Queries go to the database the router picks for the model (the replica,
+when there is one) and writes to the one the row was saved to; whether
+the FTS5 table exists is checked once per database alias.
+"""
+import re
+
+from django.apps import apps
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connection, connections, router
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+from .pagination import KeysetPage, page_size
+
+TABLE = "search_index"
+
+# kind -> (model, indexed fields; the first one is the "name")
+SOURCES = {
+    "customer": ("crm.Customer", ("name", "phone", "email", "address")),
+    "supplier": ("crm.Supplier", ("name", "company", "phone", "email", "address")),
+    "product": ("inventory.Product", ("animal_type", "meat_type", "code", "weight_kg")),
+}
+
+_TOKEN = re.compile(r"\w+")
+_enabled = {}  # database alias -> whether it has the FTS5 table
+
+
+def create_table(schema_editor):
+    """Create the FTS5 table if this is SQLite with FTS5; returns whether it exists."""
+    if schema_editor.connection.vendor != "sqlite":
+        return False
+    try:
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+            "kind UNINDEXED, object_id UNINDEXED, body, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+    except OperationalError:
+        return False
+    _enabled.pop(schema_editor.connection.alias, None)
+    return True
+
+
+def enabled(using=DEFAULT_DB_ALIAS):
+    if using not in _enabled:
+        db = connections[using]
+        _enabled[using] = db.vendor == "sqlite" and TABLE in db.introspection.table_names()
+    return _enabled[using]
+
+
+def _read_alias(model):
+    return router.db_for_read(model) or DEFAULT_DB_ALIAS
+
+
+def _write_alias(instance):
+    return instance._state.db or router.db_for_write(type(instance)) or DEFAULT_DB_ALIAS
+
+
+def kind_of(model):
+    label = model._meta.label
+    return next((kind for kind, (source, _) in SOURCES.items() if source == label), None)
+
+
+def body(instance, fields):
+    return " ".join(str(value) for value in (getattr(instance, f) for f in fields) if value not in (None, ""))
+
+
+def index(instance):
+    """(Re)index one row."""
+    kind = kind_of(type(instance))
+    using = _write_alias(instance)
+    if kind is None or not enabled(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE} WHERE kind = %s AND object_id = %s", [kind, instance.pk])
+        cursor.execute(
+            f"INSERT INTO {TABLE} (kind, object_id, body) VALUES (%s, %s, %s)",
+            [kind, instance.pk, body(instance, SOURCES[kind][1])],
+        )
+
+
+def remove(instance):
+    kind = kind_of(type(instance))
+    using = _write_alias(instance)
+    if kind is None or not enabled(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE} WHERE kind = %s AND object_id = %s", [kind, instance.pk])
+
+
+def rebuild(get_model=apps.get_model, db=connection, chunk_size=1000):
+    """Empty the index and refill it from every source table. Returns {kind: rows}."""
+    insert = f"INSERT INTO {TABLE} (kind, object_id, body) VALUES (%s, %s, %s)"
+    counts = {}
+    with db.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE}")
+        for kind, (label, fields) in SOURCES.items():
+            counts[kind] = 0
+            rows = []
+            for instance in get_model(label).objects.only(*fields).iterator(chunk_size=chunk_size):
+                rows.append((kind, instance.pk, body(instance, fields)))
+                if len(rows) == chunk_size:
+                    cursor.executemany(insert, rows)
+                    counts[kind] += len(rows)
+                    rows = []
+            if rows:
+                cursor.executemany(insert, rows)
+                counts[kind] += len(rows)
+    return counts
+
+
+def match_query(text):
+    """FTS5 query: every word of `text` as a quoted prefix, all required."""
+    return " ".join(f'"{token}"*' for token in _TOKEN.findall(text))
+
+
+def _fallback(model, fields, text):
+    queryset = model.objects.all()
+    for token in _TOKEN.findall(text):
+        term = Q()
+        for field in fields:
+            term |= Q(**{f"{field}__icontains": token})
+        queryset = queryset.filter(term)
+    return queryset.order_by(
+        Case(When(**{f"{fields[0]}__istartswith": text}, then=Value(0)), default=Value(1), output_field=IntegerField()),
+        fields[0],
+        "pk",
+    )
+
+
+def _ranked_ids(using, kind, query, offset, limit):
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"SELECT object_id FROM {TABLE} WHERE {TABLE} MATCH %s AND kind = %s "
+            "ORDER BY rank LIMIT %s OFFSET %s",
+            [f"body : ({query})", kind, limit, offset],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search(model, text, offset=0, limit=20):
+    """Up to `limit` rows of `model` matching `text`, best first, and whether there are more."""
+    kind = kind_of(model)
+    query = match_query(text)
+    if not query:
+        return [], False
+
+    using = _read_alias(model)
+    if not enabled(using):
+        rows = list(_fallback(model, SOURCES[kind][1], text)[offset:offset + limit + 1])
+        return rows[:limit], len(rows) > limit
+
+    ids = _ranked_ids(using, kind, query, offset, limit + 1)
+    found = model.objects.using(using).in_bulk(ids[:limit])
+    return [found[pk] for pk in ids[:limit] if pk in found], len(ids) > limit
+
+
+def matching_ids(model, text, limit=1000):
+    """pks of the best `limit` matches, for narrowing other querysets."""
+    kind = kind_of(model)
+    query = match_query(text)
+    if not query:
+        return []
+    using = _read_alias(model)
+    if not enabled(using):
+        return list(_fallback(model, SOURCES[kind][1], text).values_list("pk", flat=True)[:limit])
+    return _ranked_ids(using, kind, query, 0, limit)
+
+
+def filter_matching(queryset, text):
+    """`queryset` narrowed to every row matching `text`, through a subquery rather than a list of ids."""
+    kind = kind_of(queryset.model)
+    query = match_query(text)
+    if not query:
+        return queryset.none()
+    if not enabled(queryset.db):
+        return queryset.filter(pk__in=_fallback(queryset.model, SOURCES[kind][1], text).order_by().values("pk"))
+    return queryset.filter(pk__in=RawSQL(
+        f"SELECT object_id FROM {TABLE} WHERE {TABLE} MATCH %s AND kind = %s",
+        [f"body : ({query})", kind],
+    ))
+
+
+def search_page(request, model, default_size=20):
+    """
+    A page of ?q= results for the list pages and search endpoints, shaped
+    like core.pagination's KeysetPage; ?page= (1-based) moves through it.
+    """
+    try:
+        number = max(1, int(request.GET.get("page", 1)))
+    except ValueError:
+        number = 1
+    size = page_size(request, default=default_size)
+
+    items, more = search(model, request.GET.get("q", ""), offset=(number - 1) * size, limit=size)
+
+    next_page = next_url = None
+    if more:
+        next_page = number + 1
+        params = request.GET.copy()
+        params["page"] = next_page
+        next_url = f"{request.path}?{params.urlencode()}"
+    return KeysetPage(items, next_page, next_url)
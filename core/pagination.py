@@ -0,0 +1,112 @@
+"""
+Keyset ("cursor") pagination for the list pages.
+
+Lists are ordered newest first on (date field, id). The cursor is the key
+of the last row shown, and the next page is simply "rows before that key".
+With a composite index on (date field, id) every page costs the same as
+the first one, however deep you go.
+"""
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import JsonResponse
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor, next_url, first_url=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.next_url = next_url
+        self.first_url = first_url  # the newest page, same filters
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor, fields):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if len(values) != len(fields):
+            return None
+        return [field.to_python(value) for field, value in zip(fields, values)]
+    except (ValueError, TypeError, ValidationError):
+        return None
+
+
+def page_size(request, default=DEFAULT_PAGE_SIZE):
+    try:
+        size = int(request.GET.get("page_size", default))
+    except ValueError:
+        size = default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def paginate(request, queryset, key="date"):
+    """
+    Return a KeysetPage of `queryset` ordered by (-key, -id), starting after
+    ?cursor= and holding ?page_size= rows.
+    """
+    fields = [queryset.model._meta.get_field(key), queryset.model._meta.pk]
+    queryset = queryset.order_by(f"-{key}", "-pk")
+
+    cursor = request.GET.get("cursor")
+    values = decode_cursor(cursor, fields) if cursor else None
+    if values:
+        last_key, last_pk = values
+        queryset = queryset.filter(
+            Q(**{f"{key}__lt": last_key}) | Q(**{key: last_key, "pk__lt": last_pk})
+        )
+
+    size = page_size(request)
+    items = list(queryset[: size + 1])
+
+    first_url = None
+    if cursor:
+        params = request.GET.copy()
+        del params["cursor"]
+        first_url = f"{request.path}?{params.urlencode()}" if params else request.path
+
+    next_cursor = next_url = None
+    if len(items) > size:
+        items = items[:size]
+        last = items[-1]
+        next_cursor = encode_cursor([getattr(last, key), last.pk])
+        params = request.GET.copy()
+        params["cursor"] = next_cursor
+        next_url = f"{request.path}?{params.urlencode()}"
+
+    return KeysetPage(items, next_cursor, next_url, first_url)
+
+
+def wants_json(request):
+    return (
+        request.GET.get("format") == "json"
+        or "application/json" in request.headers.get("Accept", "")
+    )
+
+
+def json_page(page, row):
+    """The "load more" response: one dict per row plus the next cursor."""
+    return JsonResponse({
+        "results": [row(item) for item in page],
+        "next_cursor": page.next_cursor,
+        "next": page.next_url,
+    })
@@ -0,0 +1,104 @@
+"""
+Per-request query budgets and N+1 detection.
+
+Turn on with QUERY_BUDGET_ENABLED = True. QueryBudgetMiddleware then counts
+every query a request runs (on all database aliases) and groups them by
+shape, i.e. the SQL with its parameters left out. A request is flagged
+when it runs more queries than its view allows, or when one shape repeats
+QUERY_BUDGET_REPEAT_THRESHOLD times or more, which is what a lazy foreign
+key in a template loop looks like. Flagged requests are logged on the
+"core.querybudget" logger, or raise QueryBudgetExceeded when
+QUERY_BUDGET_RAISE is set.
+
+Views declare their budget with @query_budget(n); everything else gets
+QUERY_BUDGET_DEFAULT.
+"""
+import logging
+import re
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger("core.querybudget")
+
+_IN_LIST = re.compile(r"\(\s*%s(?:\s*,\s*%s)*\s*\)")
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(queries):
+    """Declare how many queries a view may run per request."""
+    def decorator(view_func):
+        view_func.query_budget = queries
+        return view_func
+    return decorator
+
+
+def query_shape(sql):
+    shape = _IN_LIST.sub("(...)", sql)
+    return _LITERAL.sub("?", shape)
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.count = 0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        self.shapes[query_shape(sql)] += 1
+        return execute(sql, params, many, context)
+
+    def repeated(self, threshold):
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+
+@contextmanager
+def record_queries():
+    """Count the queries run inside the block, on every database alias."""
+    recorder = QueryRecorder()
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(recorder))
+        yield recorder
+
+
+def check(recorder, budget, label):
+    """Return a list of problems with what `recorder` saw (empty when fine)."""
+    problems = []
+    if budget is not None and recorder.count > budget:
+        problems.append(f"{label}: {recorder.count} queries, budget is {budget}")
+    for shape, n in recorder.repeated(settings.QUERY_BUDGET_REPEAT_THRESHOLD):
+        problems.append(f"{label}: possible N+1, {n}x {shape[:200]}")
+    return problems
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        if not settings.QUERY_BUDGET_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.query_budget = settings.QUERY_BUDGET_DEFAULT
+
+        with record_queries() as recorder:
+            response = self.get_response(request)
+
+        response.headers["X-Query-Count"] = str(recorder.count)
+        problems = check(recorder, request.query_budget, f"{request.method} {request.path}")
+        if problems:
+            if settings.QUERY_BUDGET_RAISE:
+                raise QueryBudgetExceeded("; ".join(problems))
+            for problem in problems:
+                logger.warning(problem)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = getattr(view_func, "query_budget", settings.QUERY_BUDGET_DEFAULT)
@@ -0,0 +1,73 @@
+"""
+Test helpers.
+
+assert_query_budgets() requests every URL of the given URLconfs with a
+logged-in test client and fails with one message listing every view that
+ran more queries than its @query_budget (or repeated a query shape, see
+core.querybudget). Typical use from a TestCase:
+
+    def test_query_budgets(self):
+        self.client.force_login(self.user)
+        assert_query_budgets(self.client, url_kwargs={"pk": self.invoice.pk})
+"""
+import re
+
+from django.conf import settings
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+
+from .querybudget import check, record_queries
+
+DEFAULT_URLCONFS = ("sales.urls", "inventory.urls", "crm.urls")
+
+# These change data on GET, so the helper leaves them alone by default.
+UNSAFE_URL_NAMES = re.compile(r"delete|receive|convert|to_invoice")
+
+
+def _patterns(urlconf):
+    for pattern in get_resolver(urlconf).url_patterns:
+        if isinstance(pattern, URLPattern) and pattern.name:
+            yield pattern
+        elif isinstance(pattern, URLResolver):
+            yield from pattern.url_patterns
+
+
+def assert_query_budgets(
+    client,
+    urlconfs=DEFAULT_URLCONFS,
+    url_kwargs=None,
+    budgets=None,
+    exclude=UNSAFE_URL_NAMES,
+):
+    """
+    `url_kwargs` fills URL parameters by name (anything missing becomes 1),
+    `budgets` overrides the budget for a URL name, and URL names matching
+    `exclude` are skipped.
+    """
+    url_kwargs = url_kwargs or {}
+    budgets = budgets or {}
+    problems = []
+    seen = set()
+
+    for urlconf in urlconfs:
+        for pattern in _patterns(urlconf):
+            name = pattern.name
+            if name in seen or (exclude and exclude.search(name)):
+                continue
+            seen.add(name)
+
+            kwargs = {key: url_kwargs.get(key, 1) for key in pattern.pattern.regex.groupindex}
+            url = reverse(name, kwargs=kwargs)
+            budget = budgets.get(
+                name,
+                getattr(pattern.callback, "query_budget", settings.QUERY_BUDGET_DEFAULT),
+            )
+
+            with record_queries() as recorder:
+                response = client.get(url)
+                if getattr(response, "streaming", False):
+                    b"".join(response.streaming_content)
+
+            problems.extend(check(recorder, budget, f"{name} ({url})"))
+
+    if problems:
+        raise AssertionError("Query budget exceeded:\n" + "\n".join(problems))
@@ -0,0 +1,146 @@
+import time
+
+from django.contrib.auth.models import User
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from crm.models import Customer, Supplier
+from inventory.models import Product
+from sales.models import (
+    CustomerOrder, CustomerOrderItem,
+    Invoice, InvoiceItem,
+    PurchaseOrder, PurchaseOrderItem,
+    Quotation, QuotationItem,
+    Receipt,
+)
+
+from .db_routers import PIN_COOKIE, ReplicaMiddleware, ReplicaRouter, primary, reporting
+from .testing import assert_query_budgets
+
+router = ReplicaRouter()
+
+
+def read_alias():
+    return router.db_for_read(Invoice) or "default"
+
+
+@reporting
+def report_view(request):
+    return HttpResponse(read_alias())
+
+
+def plain_view(request):
+    return HttpResponse(read_alias())
+
+
+@reporting
+def writing_view(request):
+    router.db_for_write(Invoice)
+    return HttpResponse(read_alias())
+
+
+@reporting
+def streaming_view(request):
+    return StreamingHttpResponse(read_alias() for _ in range(2))
+
+
+@reporting
+def auth_view(request):
+    return HttpResponse(router.db_for_read(User) or "default")
+
+
+@reporting
+def primary_view(request):
+    with primary():
+        return HttpResponse(read_alias())
+
+
+@override_settings(REPLICA_DATABASE="replica", REPLICA_PIN_SECONDS=15)
+class ReplicaRoutingTests(SimpleTestCase):
+    factory = RequestFactory()
+
+    def call(self, view, method="get", cookies=None):
+        request = getattr(self.factory, method)("/")
+        request.COOKIES.update(cookies or {})
+
+        def get_response(request):
+            return middleware.process_view(request, view, (), {}) or view(request)
+
+        middleware = ReplicaMiddleware(get_response)
+        return middleware(request)
+
+    def test_reporting_reads_go_to_the_replica(self):
+        self.assertEqual(self.call(report_view).content, b"replica")
+
+    def test_other_views_and_writes_stay_on_the_primary(self):
+        self.assertEqual(self.call(plain_view).content, b"default")
+        self.assertEqual(self.call(report_view, method="post").content, b"default")
+        self.assertEqual(router.db_for_write(Invoice), "default")
+
+    def test_sessions_and_users_come_from_the_primary(self):
+        self.assertEqual(self.call(auth_view).content, b"default")
+
+    def test_primary_block(self):
+        self.assertEqual(self.call(primary_view).content, b"default")
+
+    def test_a_write_pins_the_browser_to_the_primary(self):
+        response = self.call(writing_view)
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        pinned = {PIN_COOKIE: response.cookies[PIN_COOKIE].value}
+        self.assertEqual(self.call(report_view, cookies=pinned).content, b"default")
+
+        expired = {PIN_COOKIE: str(int(time.time()) - 1)}
+        self.assertEqual(self.call(report_view, cookies=expired).content, b"replica")
+
+    def test_reads_only_do_not_pin(self):
+        self.assertNotIn(PIN_COOKIE, self.call(report_view).cookies)
+
+    def test_streamed_content_is_read_from_the_replica(self):
+        response = self.call(streaming_view)
+        self.assertEqual(b"".join(response.streaming_content), b"replicareplica")
+        self.assertEqual(read_alias(), "default")
+
+    def test_the_replica_is_never_migrated(self):
+        self.assertIs(router.allow_migrate("replica", "sales"), False)
+        self.assertIsNone(router.allow_migrate("default", "sales"))
+
+    @override_settings(REPLICA_DATABASE=None)
+    def test_without_a_replica_everything_reads_the_primary(self):
+        self.assertEqual(self.call(report_view).content, b"default")
+
+
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser("admin", "admin@example.com", "password")
+        customer = Customer.objects.create(name="Customer")
+        supplier = Supplier.objects.create(name="Supplier")
+        # A few of each, so a list that queries per row repeats itself.
+        for n in range(3):
+            product = Product.objects.create(
+                animal_type="Cow", meat_type="Beef", weight_kg=1,
+                cost_price_per_kg=1, selling_price_per_kg=2, stock=100,
+            )
+            quotation = Quotation.objects.create(customer=customer)
+            QuotationItem.objects.create(quotation=quotation, product=product, quantity=1, price=2)
+            invoice = Invoice.objects.create(customer=customer, quotation=quotation)
+            InvoiceItem.objects.create(invoice=invoice, product=product, quantity=1, price=2)
+            Receipt.objects.create(invoice=invoice, amount_paid=1)
+            po = PurchaseOrder.objects.create(supplier=supplier)
+            PurchaseOrderItem.objects.create(purchase_order=po, product=product, quantity=1, cost_price=1)
+            order = CustomerOrder.objects.create(customer=customer)
+            CustomerOrderItem.objects.create(order=order, product=product, quantity=1, price=2)
+        cls.invoice = Invoice.objects.order_by("pk").first()
+        cls.receipt = Receipt.objects.order_by("pk").first()
+        cls.po = PurchaseOrder.objects.order_by("pk").first()
+
+    def test_list_and_detail_views_stay_within_budget(self):
+        self.client.force_login(self.user)
+        # The first row of every table has pk 1; items and receipts belong to it.
+        assert_query_budgets(self.client, url_kwargs={
+            "invoice_id": self.invoice.pk,
+            "receipt_id": self.receipt.pk,
+            "po_id": self.po.pk,
+            "item_id": self.po.items.get().pk,
+        })
@@ -12,5 +12,6 @@ urlpatterns = [
     path("sales/", include("sales.urls")),
     
     path("hr/", include("hr.urls")),
+    path("exports/<slug:name>.<slug:fmt>", views.export, name="export"),
     path("", views.dashboard, name="dashboard"),
 ]
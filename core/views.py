@@ -1,94 +1,52 @@
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
-from django.db.models import Sum, F
 from datetime import date
 
 from inventory.models import Product
 
-from django.db.models.functions import TruncMonth
-
-from sales.models import Invoice, Receipt, Quotation, PurchaseOrder
+from sales.models import Invoice, Receipt, Quotation
+from sales.kpis import get_kpis
+from core.db_routers import reporting
+from core.querybudget import query_budget
+from core import exports
 
 @login_required
+@reporting
+@query_budget(12)
 def dashboard(request):
-    # -------- TOP KPIs --------
-
-    # 1) Actual money received (from receipts)
-    total_sales = (
-        Receipt.objects.aggregate(total=Sum("amount_paid"))["total"] or 0
-    )
-
-    # 2) Invoices
-    total_invoices = Invoice.objects.count()
-    unpaid_invoices = Invoice.objects.filter(
-        status__in=["Unpaid", "Partially Paid"]
-    ).count()
+    # -------- TOP KPIs (cached, see sales.kpis) --------
+    kpis = get_kpis()
 
-    # 3) Quotations
-    total_quotations = Quotation.objects.count()
-    pending_quotations = Quotation.objects.filter(
-        status__in=["Draft", "Sent"]
-    ).count()
-
-    # 4) Purchases (only POs that are Received)
-    total_purchases = (
-        PurchaseOrder.objects.filter(status="Received")
-        .aggregate(total=Sum("total_amount"))["total"]
-        or 0
-    )
-    pending_purchase_orders = PurchaseOrder.objects.filter(
-        status="Pending"
-    ).count()
-
-    # -------- Low stock products (using your new Product model) --------
-    LOW_STOCK_THRESHOLD = 5
+    # -------- Low stock products (inv_product_low_stock_idx) --------
     low_stock_products = (
-        Product.objects.filter(stock__lte=LOW_STOCK_THRESHOLD)
+        Product.objects.filter(stock__lte=Product.LOW_STOCK)
         .order_by("stock")[:5]
     )
 
     # -------- Recent activity --------
-    recent_invoices = Invoice.objects.order_by("-date")[:5]
-    recent_quotations = Quotation.objects.order_by("-date")[:5]
-    recent_receipts = Receipt.objects.order_by("-date")[:5]
+    # Newest first on the (date, id) indexes. Customers are fetched
+    # separately: joined, SQLite (once ANALYZEd) starts from the small
+    # customer table and sorts every invoice to find the last five.
+    recent_invoices = Invoice.objects.prefetch_related("customer").order_by("-date", "-id")[:5]
+    recent_quotations = Quotation.objects.prefetch_related("customer").order_by("-date", "-id")[:5]
+    recent_receipts = Receipt.objects.select_related("invoice__customer").order_by("-date", "-id")[:5]
 
     # -------- Charts: Sales & Purchases by month --------
-
-    # Sales by month from receipts
-    sales_by_month = (
-        Receipt.objects
-        .annotate(month=TruncMonth("date"))
-        .values("month")
-        .annotate(total=Sum("amount_paid"))
-        .order_by("month")
-    )
-    sales_labels = [
-        s["month"].strftime("%b %Y") for s in sales_by_month if s["month"]
-    ]
-    sales_values = [float(s["total"]) for s in sales_by_month]
-
-    # Purchases by month from POs
-    purchases_by_month = (
-        PurchaseOrder.objects.filter(status="Received")
-        .annotate(month=TruncMonth("date"))
-        .values("month")
-        .annotate(total=Sum("total_amount"))
-        .order_by("month")
-    )
-    purchase_labels = [
-        p["month"].strftime("%b %Y") for p in purchases_by_month if p["month"]
-    ]
-    purchase_values = [float(p["total"]) for p in purchases_by_month]
+    sales_labels = [label for label, _ in kpis["sales_by_month"]]
+    sales_values = [value for _, value in kpis["sales_by_month"]]
+    purchase_labels = [label for label, _ in kpis["purchases_by_month"]]
+    purchase_values = [value for _, value in kpis["purchases_by_month"]]
 
     context = {
         # KPIs
-        "total_sales": total_sales,
-        "total_invoices": total_invoices,
-        "unpaid_invoices": unpaid_invoices,
-        "total_quotations": total_quotations,
-        "pending_quotations": pending_quotations,
-        "total_purchases": total_purchases,
-        "pending_purchase_orders": pending_purchase_orders,
+        "total_sales": kpis["total_sales"],
+        "total_invoices": kpis["total_invoices"],
+        "unpaid_invoices": kpis["unpaid_invoices"],
+        "total_quotations": kpis["total_quotations"],
+        "pending_quotations": kpis["pending_quotations"],
+        "total_purchases": kpis["total_purchases"],
+        "pending_purchase_orders": kpis["pending_purchase_orders"],
         "low_stock_products": low_stock_products,
 
         # Recent
@@ -104,4 +62,29 @@ def dashboard(request):
     }
 
     # IMPORTANT: template name matches your structure
-    return render(request, "dashboard.html", context)
\ No newline at end of file
+    return render(request, "dashboard.html", context)
+
+
+# --------------------------------------------------------
+# CSV / XLSX EXPORTS (core.exports)
+# --------------------------------------------------------
+@login_required
+@reporting
+@query_budget(3)
+def export(request, name, fmt):
+    spec = exports.EXPORTS.get(name)
+    if spec is None or fmt not in ("csv", "xlsx"):
+        raise Http404("No such export.")
+    filename = f"{name}-{date.today():%Y%m%d}.{fmt}"
+
+    if fmt == "xlsx":
+        output = exports.xlsx_file(spec, request.GET)
+        if output is None:
+            return HttpResponse("Excel export needs openpyxl installed; use CSV instead.", status=501)
+        return FileResponse(output, as_attachment=True, filename=filename)
+
+    response = StreamingHttpResponse(
+        exports.csv_lines(spec, request.GET), content_type="text/csv; charset=utf-8"
+    )
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,30 @@
+"""
+Form widgets.
+
+SearchSelect is a <select> that only renders the chosen option instead of
+the whole table; templates/includes/search_select.html turns it into a
+typeahead that fills the options from a JSON search endpoint (one that
+answers ?q= with {"results": [{"id": ..., "name": ...}]}).
+"""
+from django import forms
+from django.urls import reverse
+
+
+class SearchSelect(forms.Select):
+    def __init__(self, url_name, attrs=None):
+        super().__init__(attrs={"class": "form-select", **(attrs or {})})
+        self.url_name = url_name
+
+    def get_context(self, name, value, attrs):
+        attrs = {**(attrs or {}), "data-search-url": reverse(self.url_name)}
+        return super().get_context(name, value, attrs)
+
+    def optgroups(self, name, value, attrs=None):
+        chosen = [v for v in value if str(v).isdigit()]
+        queryset = self.choices.queryset
+        selected = queryset.filter(pk__in=chosen) if chosen else queryset.none()
+
+        options = [self.create_option(name, "", "-- Type to search --", False, 0, attrs=attrs)]
+        for index, obj in enumerate(selected, 1):
+            options.append(self.create_option(name, obj.pk, str(obj), True, index, attrs=attrs))
+        return [(None, options, 0)]
@@ -1,6 +1,22 @@
 # crm/admin.py
 from django.contrib import admin
+
+from core.admin import FullTextSearchAdmin
+
 from .models import Customer, Supplier
 
-admin.site.register(Customer)
-admin.site.register(Supplier)
+
+@admin.register(Customer)
+class CustomerAdmin(FullTextSearchAdmin):
+    list_display = ("name", "email", "phone", "created_at")
+    search_fields = ("name", "email", "phone")
+    date_hierarchy = "created_at"
+    ordering = ("-created_at", "-id")
+
+
+@admin.register(Supplier)
+class SupplierAdmin(FullTextSearchAdmin):
+    list_display = ("name", "company", "email", "phone", "created_at")
+    search_fields = ("name", "company", "email", "phone")
+    date_hierarchy = "created_at"
+    ordering = ("-created_at", "-id")
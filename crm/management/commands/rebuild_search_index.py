@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import fulltext
+
+
+class Command(BaseCommand):
+    help = "Refill the full-text search index of customers, suppliers and products."
+
+    def handle(self, *args, **options):
+        if not fulltext.enabled():
+            raise CommandError(
+                "No search index on this database (needs SQLite with FTS5); "
+                "search uses LIKE matching instead."
+            )
+        counts = fulltext.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            "Indexed " + ", ".join(f"{n} {kind}(s)" for kind, n in counts.items()) + "."
+        ))
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-18 20:00
+
+from django.db import migrations
+
+from core import fulltext
+
+
+def create_search_index(apps, schema_editor):
+    # SQLite with FTS5 only; elsewhere core.fulltext searches with LIKE.
+    if fulltext.create_table(schema_editor):
+        fulltext.rebuild(get_model=apps.get_model, db=schema_editor.connection)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {fulltext.TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0003_list_pagination_indexes'),
+        ('inventory', '0006_product_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
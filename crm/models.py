@@ -10,6 +10,12 @@ class Customer(models.Model):
     def __str__(self):
         return self.name
 
+    class Meta:
+        indexes = [
+            # keyset pagination of the list page (core.pagination)
+            models.Index(fields=["created_at", "id"], name="crm_customer_created_id_idx"),
+        ]
+
 
 class Supplier(models.Model):
     name = models.CharField(max_length=200)
@@ -22,3 +28,8 @@ class Supplier(models.Model):
     def __str__(self):
         return self.name
 
+    class Meta:
+        indexes = [
+            # keyset pagination of the list page (core.pagination)
+            models.Index(fields=["created_at", "id"], name="crm_supplier_created_id_idx"),
+        ]
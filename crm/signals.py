@@ -0,0 +1,21 @@
+from django.db.models.signals import post_delete, post_save
+
+from core import fulltext
+
+from .models import Customer, Supplier
+
+
+# --------------------------------------------------------
+# SEARCH INDEX (core.fulltext)
+# --------------------------------------------------------
+def update_search_index(sender, instance, **kwargs):
+    fulltext.index(instance)
+
+
+def remove_from_search_index(sender, instance, **kwargs):
+    fulltext.remove(instance)
+
+
+for model in (Customer, Supplier):
+    post_save.connect(update_search_index, sender=model, dispatch_uid=f"fulltext_save_{model.__name__}")
+    post_delete.connect(remove_from_search_index, sender=model, dispatch_uid=f"fulltext_delete_{model.__name__}")
@@ -3,10 +3,12 @@ from . import views
 
 urlpatterns = [
     path("customers/", views.customer_list, name="customer_list"),
+    path("customers/search/", views.customer_search, name="customer_search"),
     path("customers/add/", views.customer_create, name="customer_create"),
     path("customers/<int:pk>/edit/", views.customer_update, name="customer_update"),
     path("customers/<int:pk>/delete/", views.customer_delete, name="customer_delete"),
     path("suppliers/", views.supplier_list, name="supplier_list"),
+    path("suppliers/search/", views.supplier_search, name="supplier_search"),
     path("suppliers/add/", views.supplier_create, name="supplier_create"),
     path("suppliers/<int:pk>/edit/", views.supplier_update, name="supplier_update"),
     path("suppliers/<int:pk>/delete/", views.supplier_delete, name="supplier_delete"),
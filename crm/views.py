@@ -4,14 +4,42 @@ from django.contrib.auth.decorators import login_required
 from .models import Customer
 from .forms import CustomerForm , SupplierForm
 from .models import Supplier
+from core import fulltext
+from core.pagination import json_page, paginate, wants_json
+from core.db_routers import reporting
+from core.querybudget import query_budget
+
+
+def contact_row(contact):
+    return {
+        "id": contact.id,
+        "name": contact.name,
+        "email": contact.email,
+        "phone": contact.phone,
+        "created_at": contact.created_at,
+    }
 
 
 @login_required
+@reporting
+@query_budget(5)
 def customer_list(request):
-    customers = Customer.objects.all().order_by("-created_at")
+    if request.GET.get("q"):
+        customers = fulltext.search_page(request, Customer)
+    else:
+        customers = paginate(request, Customer.objects.all(), key="created_at")
+    if wants_json(request):
+        return json_page(customers, contact_row)
     return render(request, "crm/customer_list.html", {"customers": customers})
 
 
+@login_required
+@query_budget(5)
+def customer_search(request):
+    """Ranked ?q= matches on name, phone, email and address (JSON, ?page=)."""
+    return json_page(fulltext.search_page(request, Customer), contact_row)
+
+
 @login_required
 def customer_create(request):
     if request.method == "POST":
@@ -46,11 +74,25 @@ def customer_delete(request, pk):
     return render(request, "crm/customer_confirm_delete.html", {"customer": customer})
 
 @login_required
+@reporting
+@query_budget(5)
 def supplier_list(request):
-    suppliers = Supplier.objects.all().order_by("-created_at")
+    if request.GET.get("q"):
+        suppliers = fulltext.search_page(request, Supplier)
+    else:
+        suppliers = paginate(request, Supplier.objects.all(), key="created_at")
+    if wants_json(request):
+        return json_page(suppliers, contact_row)
     return render(request, "crm/supplier_list.html", {"suppliers": suppliers})
 
 
+@login_required
+@query_budget(5)
+def supplier_search(request):
+    """Ranked ?q= matches on name, company, phone, email and address (JSON, ?page=)."""
+    return json_page(fulltext.search_page(request, Supplier), contact_row)
+
+
 @login_required
 def supplier_create(request):
     if request.method == "POST":
@@ -1,5 +1,14 @@
 # hr/admin.py
 from django.contrib import admin
+
+from core.admin import EstimatedCountAdmin
+
 from .models import Employee
 
-admin.site.register(Employee)
+
+@admin.register(Employee)
+class EmployeeAdmin(EstimatedCountAdmin):
+    list_display = ("first_name", "last_name", "role", "email", "phone", "date_joined", "is_active")
+    list_filter = ("is_active",)
+    search_fields = ("first_name", "last_name", "email")
+    date_hierarchy = "date_joined"
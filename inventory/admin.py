@@ -1,5 +1,15 @@
 # inventory/admin.py
 from django.contrib import admin
+
+from core.admin import FullTextSearchAdmin
+
 from .models import Product
 
-admin.site.register(Product)
+
+@admin.register(Product)
+class ProductAdmin(FullTextSearchAdmin):
+    list_display = ("name", "code", "stock", "cost_price_per_kg", "selling_price_per_kg", "created_at")
+    list_filter = ("animal_type", "meat_type")
+    search_fields = ("^code_prefix", "animal_type", "meat_type")
+    date_hierarchy = "created_at"
+    ordering = ("-created_at", "-id")
@@ -0,0 +1,118 @@
+"""
+Stock movement ledger.
+
+Product.stock stays the live counter; every change to it is also written
+to StockMovement (PO receipts, sales, adjustments, write-offs). Periodic
+StockSnapshot rows pin each product's stock at a moment, so the stock at
+any point in time is the latest snapshot before it plus the movements
+since, and compact() keeps that tail short by folding old movements into
+a snapshot.
+"""
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import DateTimeField, F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Product, StockMovement, StockSnapshot
+
+# Stands in for "no snapshot yet": every movement counts.
+BEGINNING = datetime(2000, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def record(product_id, kind, quantity, reference="", note=""):
+    """Write one movement. The caller changes Product.stock itself."""
+    if quantity:
+        return StockMovement.objects.create(
+            product_id=product_id, kind=kind, quantity=quantity,
+            reference=reference, note=note,
+        )
+
+
+def record_many(kind, rows, note=""):
+    """Write movements for (product_id, quantity, reference) rows in one INSERT."""
+    return StockMovement.objects.bulk_create([
+        StockMovement(product_id=product_id, kind=kind, quantity=quantity, reference=reference, note=note)
+        for product_id, quantity, reference in rows
+        if quantity
+    ])
+
+
+def write_off(product, quantity, reference="", note=""):
+    """
+    Take `quantity` spoiled or lost units out of stock and record the
+    write-off. Only happens when that many are in stock (checked in the
+    UPDATE itself); returns the movement, or None when there are not.
+    """
+    pk = getattr(product, "pk", product)
+    with transaction.atomic():
+        updated = Product.objects.filter(pk=pk, stock__gte=quantity).update(stock=F("stock") - quantity)
+        if updated:
+            return record(pk, StockMovement.WRITE_OFF, -quantity, reference=reference, note=note)
+
+
+def _latest_snapshot(when):
+    return StockSnapshot.objects.filter(product=OuterRef("pk"), taken_at__lte=when).order_by("-taken_at")
+
+
+def stock_levels_at(when, products=None):
+    """{product_id: stock} as it stood at `when`, in a single query."""
+    products = Product.objects.all() if products is None else products
+    snapshot = _latest_snapshot(when)
+    tail = (
+        StockMovement.objects.filter(
+            product=OuterRef("pk"),
+            created_at__lte=when,
+            created_at__gt=Coalesce(OuterRef("snapshot_at"), Value(BEGINNING, output_field=DateTimeField())),
+        )
+        .values("product")
+        .annotate(total=Sum("quantity"))
+        .values("total")
+    )
+    rows = (
+        products.annotate(
+            snapshot_at=Subquery(snapshot.values("taken_at")[:1]),
+            snapshot_stock=Coalesce(Subquery(snapshot.values("stock")[:1]), 0),
+            tail=Coalesce(Subquery(tail, output_field=IntegerField()), 0),
+        )
+        .values_list("pk", "snapshot_stock", "tail")
+        .order_by()
+    )
+    return {pk: snapshot_stock + tail for pk, snapshot_stock, tail in rows}
+
+
+def stock_at(product, when):
+    """Stock of one product at `when`."""
+    pk = getattr(product, "pk", product)
+    return stock_levels_at(when, Product.objects.filter(pk=pk)).get(pk, 0)
+
+
+def take_snapshots(when=None):
+    """
+    Snapshot every product at `when` (from the ledger), or now (from the
+    live Product.stock counter). Returns the number of snapshots written.
+    """
+    if when is None:
+        when = timezone.now()
+        levels = dict(Product.objects.values_list("pk", "stock"))
+    else:
+        levels = stock_levels_at(when)
+
+    return len(StockSnapshot.objects.bulk_create(
+        [StockSnapshot(product_id=pk, taken_at=when, stock=stock) for pk, stock in levels.items()],
+        ignore_conflicts=True,
+    ))
+
+
+def compact(before):
+    """
+    Fold all movements up to `before` into snapshots taken at `before`, then
+    delete them. Returns (snapshots written, movements deleted). Stock at any
+    time from `before` on stays exact; earlier history is kept at the
+    granularity of the snapshots.
+    """
+    with transaction.atomic():
+        written = take_snapshots(before)
+        deleted, _ = StockMovement.objects.filter(created_at__lte=before).delete()
+    return written, deleted
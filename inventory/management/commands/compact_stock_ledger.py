@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from inventory import ledger
+
+
+class Command(BaseCommand):
+    help = "Fold stock movements older than --keep-days into per-product snapshots, or just take a snapshot."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--keep-days",
+            type=int,
+            default=90,
+            help="Movements from the last N days stay in the ledger (default 90).",
+        )
+        parser.add_argument(
+            "--snapshot-only",
+            action="store_true",
+            help="Snapshot every product's current stock and delete nothing.",
+        )
+
+    def handle(self, *args, **options):
+        if options["snapshot_only"]:
+            written = ledger.take_snapshots()
+            self.stdout.write(self.style.SUCCESS(f"Took {written} stock snapshot(s)."))
+            return
+
+        before = timezone.now() - timedelta(days=options["keep_days"])
+        written, deleted = ledger.compact(before)
+        self.stdout.write(self.style.SUCCESS(
+            f"Compacted {deleted} movement(s) up to {before:%Y-%m-%d %H:%M} into {written} snapshot(s)."
+        ))
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_remove_product_category_remove_product_description_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['created_at', 'id'], name='inv_product_created_id_idx'),
+        ),
+    ]
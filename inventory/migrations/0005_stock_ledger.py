@@ -0,0 +1,54 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:55
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def opening_snapshots(apps, schema_editor):
+    # The ledger starts from today's counters.
+    Product = apps.get_model("inventory", "Product")
+    StockSnapshot = apps.get_model("inventory", "StockSnapshot")
+    now = django.utils.timezone.now()
+    StockSnapshot.objects.bulk_create([
+        StockSnapshot(product_id=pk, taken_at=now, stock=stock)
+        for pk, stock in Product.objects.values_list("pk", "stock")
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_list_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('receipt', 'PO receipt'), ('sale', 'Sale'), ('adjustment', 'Adjustment'), ('write_off', 'Write-off')], max_length=20)),
+                ('quantity', models.IntegerField()),
+                ('reference', models.CharField(blank=True, max_length=50)),
+                ('note', models.CharField(blank=True, max_length=200)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='inventory.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'created_at'], name='inv_movement_product_at_idx'), models.Index(fields=['created_at'], name='inv_movement_at_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField()),
+                ('stock', models.IntegerField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='inventory.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('product', 'taken_at'), name='inv_snapshot_product_at_uniq')],
+            },
+        ),
+        migrations.RunPython(opening_snapshots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:57
+
+from django.db import migrations, models
+
+
+def fill_code_prefix(apps, schema_editor):
+    Product = apps.get_model("inventory", "Product")
+    products = list(Product.objects.only("id", "code"))
+    for product in products:
+        product.code_prefix = product.code.hex[:8]
+    Product.objects.bulk_update(products, ["code_prefix"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='code_prefix',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=8),
+        ),
+        migrations.RunPython(fill_code_prefix, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['animal_type', 'meat_type', 'weight_kg'], name='inv_product_type_weight_idx'),
+        ),
+    ]
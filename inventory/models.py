@@ -1,6 +1,12 @@
 from django.db import models
+from django.utils import timezone
 import uuid
 
+# At or below this the product shows up under "low stock" on the dashboard.
+# Also the condition of inv_product_low_stock_idx: a change needs a migration.
+LOW_STOCK = 5
+
+
 class Product(models.Model):
 
     ANIMAL_CHOICES = [
@@ -30,8 +36,12 @@ class Product(models.Model):
 
     stock = models.PositiveIntegerField(default=1)
 
+    LOW_STOCK = LOW_STOCK
+
     # ✅ Unique code for label / QR / reference
     code = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    # First 8 hex digits of code, as printed on the label; indexed for lookups
+    code_prefix = models.CharField(max_length=8, editable=False, db_index=True, blank=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -52,3 +62,64 @@ class Product(models.Model):
 
     def __str__(self):
         return self.name
+
+    def save(self, *args, **kwargs):
+        self.code_prefix = uuid.UUID(str(self.code)).hex[:8]
+        super().save(*args, **kwargs)
+
+    class Meta:
+        indexes = [
+            # keyset pagination of the list page (core.pagination)
+            models.Index(fields=["created_at", "id"], name="inv_product_created_id_idx"),
+            # product search (inventory.search)
+            models.Index(fields=["animal_type", "meat_type", "weight_kg"], name="inv_product_type_weight_idx"),
+            # the dashboard's low stock list (LOW_STOCK); small as most products are stocked
+            models.Index(fields=["stock"], condition=models.Q(stock__lte=LOW_STOCK), name="inv_product_low_stock_idx"),
+        ]
+
+
+# --------------------------------------------------------
+# STOCK LEDGER (see inventory.ledger)
+# --------------------------------------------------------
+class StockMovement(models.Model):
+    RECEIPT = "receipt"
+    SALE = "sale"
+    ADJUSTMENT = "adjustment"
+    WRITE_OFF = "write_off"
+
+    KIND_CHOICES = [
+        (RECEIPT, "PO receipt"),
+        (SALE, "Sale"),
+        (ADJUSTMENT, "Adjustment"),
+        (WRITE_OFF, "Write-off"),
+    ]
+
+    product = models.ForeignKey(Product, related_name="movements", on_delete=models.CASCADE)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    quantity = models.IntegerField()  # signed: + into stock, - out of stock
+    reference = models.CharField(max_length=50, blank=True)  # e.g. "PO #12", "INV-0042"
+    note = models.CharField(max_length=200, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.quantity:+d} - {self.product}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["product", "created_at"], name="inv_movement_product_at_idx"),
+            models.Index(fields=["created_at"], name="inv_movement_at_idx"),
+        ]
+
+
+class StockSnapshot(models.Model):
+    product = models.ForeignKey(Product, related_name="snapshots", on_delete=models.CASCADE)
+    taken_at = models.DateTimeField()
+    stock = models.IntegerField()
+
+    def __str__(self):
+        return f"{self.product}: {self.stock} at {self.taken_at:%Y-%m-%d %H:%M}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["product", "taken_at"], name="inv_snapshot_product_at_uniq"),
+        ]
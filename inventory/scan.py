@@ -0,0 +1,125 @@
+"""
+Resolving scanned label codes to products.
+
+A scan is either the full code from the QR (with or without hyphens) or
+the 8-digit "ID" printed on the label. Lookups hit the unique code index
+or the indexed code_prefix column, and answers are kept in a small
+in-process cache: a hit costs no query at all. inventory.signals drops a
+product's entries whenever it is saved or deleted; entries also expire
+after PRODUCT_SCAN_CACHE_SECONDS, which bounds how long another worker
+process can serve an old price.
+"""
+import re
+import threading
+import time
+import uuid
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Q
+
+from .models import Product
+
+CENTS = Decimal("0.01")
+_HEX = re.compile(r"^(?:[0-9a-f]{8}|[0-9a-f]{32})$")
+
+_entries = {}  # normalized code -> (expires at, result)
+_lock = threading.Lock()
+
+
+def normalize(code):
+    """Lower-case hex without hyphens, or None if it cannot be a label code."""
+    code = (code or "").strip().lower().replace("-", "")
+    return code if _HEX.match(code) else None
+
+
+def row(product):
+    return {
+        "id": product.id,
+        "code": str(product.code),
+        "name": product.name,
+        "weight_kg": product.weight_kg,
+        "selling_price_per_kg": product.selling_price_per_kg,
+        "price": product.total_selling_price.quantize(CENTS),
+    }
+
+
+def forget(product):
+    """Drop the cached answers for a product's full code and prefix."""
+    code = uuid.UUID(str(product.code)).hex
+    with _lock:
+        _entries.pop(code, None)
+        _entries.pop(code[:8], None)
+
+
+def clear():
+    with _lock:
+        _entries.clear()
+
+
+def _cached(keys):
+    now = time.monotonic()
+    found = {}
+    with _lock:
+        for key in keys:
+            entry = _entries.get(key)
+            if entry and entry[0] > now:
+                found[key] = entry[1]
+    return found
+
+
+def _store(results):
+    expires = time.monotonic() + settings.PRODUCT_SCAN_CACHE_SECONDS
+    with _lock:
+        if len(_entries) + len(results) > settings.PRODUCT_SCAN_CACHE_SIZE:
+            _entries.clear()
+        for key, result in results.items():
+            _entries[key] = (expires, result)
+
+
+def _lookup(keys):
+    """Resolve uncached keys with one query."""
+    full = [uuid.UUID(key) for key in keys if len(key) == 32]
+    prefixes = [key for key in keys if len(key) == 8]
+
+    matches = {key: [] for key in keys}
+    products = Product.objects.filter(Q(code__in=full) | Q(code_prefix__in=prefixes))
+    for product in products:
+        code = product.code.hex
+        if code in matches:
+            matches[code].append(product)
+        if code[:8] in matches:
+            matches[code[:8]].append(product)
+
+    results = {}
+    for key, found in matches.items():
+        if len(found) == 1:
+            results[key] = row(found[0])
+        elif found:
+            # Two packs whose codes share the printed 8 digits: scan the QR.
+            results[key] = {"error": "ambiguous", "matches": len(found)}
+        else:
+            results[key] = {"error": "not found"}
+    return results
+
+
+def resolve_many(codes):
+    """{scanned code: product row or {"error": ...}} for a basket of scans."""
+    keys = {code: normalize(code) for code in codes}
+    wanted = {key for key in keys.values() if key}
+
+    results = _cached(wanted)
+    missing = wanted - results.keys()
+    if missing:
+        looked_up = _lookup(missing)
+        _store(looked_up)
+        results.update(looked_up)
+
+    return {
+        code: results[key] if key else {"error": "not a label code"}
+        for code, key in keys.items()
+    }
+
+
+def resolve(code):
+    return resolve_many([code])[code]
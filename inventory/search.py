@@ -0,0 +1,134 @@
+"""
+Product search for the typeahead pickers.
+
+Filters: animal_type, meat_type, min_weight / max_weight (kg), code (a
+prefix of the label code, hyphens optional) and q, free text matched
+against animal type, meat type, code and weight (through the core.fulltext
+index where there is one). Results are capped at limit
+(PRODUCT_SEARCH_MAX_LIMIT at most) and cached for
+PRODUCT_SEARCH_CACHE_SECONDS, so a burst of repeated keystrokes hits the
+database once.
+"""
+import hashlib
+import re
+import uuid
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+from core import fulltext
+
+from .models import Product
+
+CACHE_PREFIX = "inventory:product_search"
+
+_HEX = re.compile(r"^[0-9a-f]+$")
+
+
+def _code_prefix_q(code):
+    """
+    Q for products whose code starts with `code`, done as a range on the
+    indexed code_prefix column (b <= x < b + "g") so every backend can use
+    the index.
+    """
+    code = code.lower().replace("-", "")
+    if not code or not _HEX.match(code):
+        return None
+    if len(code) == 32:
+        return Q(code=uuid.UUID(code))
+    if len(code) >= 8:
+        # Past the label prefix only the first 8 digits are indexed.
+        return Q(code_prefix=code[:8])
+    return Q(code_prefix__gte=code, code_prefix__lt=code + "g")
+
+
+def _decimal(value):
+    try:
+        value = Decimal(value)
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+    # "NaN" and "Infinity" parse, but make no sense as a filter.
+    return value if value.is_finite() else None
+
+
+def row(product):
+    return {
+        "id": product.id,
+        "name": product.name,
+        "code": str(product.code),
+        "animal_type": product.animal_type,
+        "meat_type": product.meat_type,
+        "weight_kg": product.weight_kg,
+        "stock": product.stock,
+        "cost_price_per_kg": product.cost_price_per_kg,
+        "selling_price_per_kg": product.selling_price_per_kg,
+    }
+
+
+def filter_products(params):
+    """Product queryset for the search parameters (a dict or QueryDict)."""
+    products = Product.objects.all()
+
+    if params.get("animal_type"):
+        products = products.filter(animal_type=params["animal_type"])
+    if params.get("meat_type"):
+        products = products.filter(meat_type=params["meat_type"])
+
+    min_weight = _decimal(params.get("min_weight"))
+    if min_weight is not None:
+        products = products.filter(weight_kg__gte=min_weight)
+    max_weight = _decimal(params.get("max_weight"))
+    if max_weight is not None:
+        products = products.filter(weight_kg__lte=max_weight)
+
+    if params.get("code"):
+        code_q = _code_prefix_q(params["code"])
+        if code_q is None:
+            return products.none()
+        products = products.filter(code_q)
+
+    text = (params.get("q") or "").strip()
+    if text and fulltext.enabled(products.db):
+        products = products.filter(pk__in=fulltext.matching_ids(Product, text))
+        text = ""
+    for term in text.split():
+        term_q = Q(animal_type__istartswith=term) | Q(meat_type__istartswith=term)
+        code_q = _code_prefix_q(term)
+        if code_q is not None:
+            term_q |= code_q
+        products = products.filter(term_q)
+
+    if params.get("in_stock"):
+        products = products.filter(stock__gt=0)
+
+    return products
+
+
+def limit(params):
+    try:
+        value = int(params.get("limit") or settings.PRODUCT_SEARCH_LIMIT)
+    except ValueError:
+        value = settings.PRODUCT_SEARCH_LIMIT
+    return max(1, min(value, settings.PRODUCT_SEARCH_MAX_LIMIT))
+
+
+def search(params):
+    """{"results": [...], "more": bool} for the search parameters, cached briefly."""
+    size = limit(params)
+    keys = ("q", "animal_type", "meat_type", "min_weight", "max_weight", "code", "in_stock")
+    raw = "\0".join(f"{key}={params.get(key) or ''}" for key in keys) + f"\0limit={size}"
+    cache_key = f"{CACHE_PREFIX}:{hashlib.sha256(raw.encode()).hexdigest()}"
+
+    data = cache.get(cache_key)
+    if data is None:
+        products = list(
+            filter_products(params).order_by("animal_type", "meat_type", "weight_kg", "id")[:size + 1]
+        )
+        data = {
+            "results": [row(product) for product in products[:size]],
+            "more": len(products) > size,
+        }
+        cache.set(cache_key, data, settings.PRODUCT_SEARCH_CACHE_SECONDS)
+    return data
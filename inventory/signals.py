@@ -0,0 +1,49 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core import fulltext
+
+from . import ledger, scan
+from .models import Product, StockMovement
+
+
+# --------------------------------------------------------
+# STOCK LEDGER (stock edited on the product form / admin)
+# --------------------------------------------------------
+@receiver(pre_save, sender=Product)
+def remember_previous_stock(sender, instance, **kwargs):
+    instance._previous_stock = (
+        sender.objects.filter(pk=instance.pk).values_list("stock", flat=True).first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Product)
+def record_stock_adjustment(sender, instance, created, **kwargs):
+    previous = getattr(instance, "_previous_stock", None)
+    if created:
+        ledger.record(instance.pk, StockMovement.ADJUSTMENT, instance.stock, note="Opening stock")
+    elif previous is not None and previous != instance.stock:
+        ledger.record(instance.pk, StockMovement.ADJUSTMENT, instance.stock - previous)
+
+
+# --------------------------------------------------------
+# SCAN CACHE (inventory.scan)
+# --------------------------------------------------------
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def forget_scanned_product(sender, instance, **kwargs):
+    scan.forget(instance)
+
+
+# --------------------------------------------------------
+# SEARCH INDEX (core.fulltext)
+# --------------------------------------------------------
+@receiver(post_save, sender=Product)
+def update_search_index(sender, instance, **kwargs):
+    fulltext.index(instance)
+
+
+@receiver(post_delete, sender=Product)
+def remove_from_search_index(sender, instance, **kwargs):
+    fulltext.remove(instance)
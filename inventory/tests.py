@@ -0,0 +1,69 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from . import ledger
+from .models import Product, StockMovement, StockSnapshot
+
+
+def make_product(stock=10):
+    return Product.objects.create(
+        animal_type="Cow", meat_type="Beef", weight_kg=1,
+        cost_price_per_kg=1, selling_price_per_kg=2, stock=stock,
+    )
+
+
+class LedgerTests(TestCase):
+    def test_stock_edits_are_recorded_as_adjustments(self):
+        product = make_product(stock=10)
+        product.stock = 7
+        product.save()
+
+        self.assertEqual(
+            list(product.movements.order_by("id").values_list("kind", "quantity")),
+            [(StockMovement.ADJUSTMENT, 10), (StockMovement.ADJUSTMENT, -3)],
+        )
+
+    def test_write_off_only_takes_what_is_in_stock(self):
+        product = make_product(stock=5)
+
+        movement = ledger.write_off(product, 3, note="Spoiled")
+        self.assertEqual((movement.kind, movement.quantity), (StockMovement.WRITE_OFF, -3))
+        self.assertIsNone(ledger.write_off(product, 3))
+
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 2)
+        self.assertEqual(ledger.stock_at(product, timezone.now()), 2)
+
+    def test_stock_at_a_point_in_time(self):
+        product = make_product(stock=0)
+        now = timezone.now()
+        for days_ago, quantity in ((3, 10), (2, -4), (1, 5)):
+            StockMovement.objects.create(
+                product=product, kind=StockMovement.RECEIPT, quantity=quantity,
+                created_at=now - timedelta(days=days_ago),
+            )
+
+        self.assertEqual(ledger.stock_at(product, now - timedelta(days=4)), 0)
+        self.assertEqual(ledger.stock_at(product, now - timedelta(days=2)), 6)
+        self.assertEqual(ledger.stock_at(product, now), 11)
+
+    def test_compact_keeps_stock_exact(self):
+        product = make_product(stock=0)
+        now = timezone.now()
+        for days_ago, quantity in ((3, 10), (2, -4), (1, 5)):
+            StockMovement.objects.create(
+                product=product, kind=StockMovement.SALE, quantity=quantity,
+                created_at=now - timedelta(days=days_ago),
+            )
+        before = {days: ledger.stock_at(product, now - timedelta(days=days)) for days in (2, 1, 0)}
+
+        written, deleted = ledger.compact(now - timedelta(days=2))
+
+        self.assertEqual(written, 1)
+        self.assertEqual(deleted, 2)
+        self.assertEqual(StockSnapshot.objects.get(product=product).stock, 6)
+        self.assertEqual(
+            {days: ledger.stock_at(product, now - timedelta(days=days)) for days in (2, 1, 0)}, before,
+        )
@@ -3,6 +3,9 @@ from . import views
 
 urlpatterns = [
     path("", views.product_list, name="product_list"),
+    path("search/", views.product_search, name="product_search"),
+    path("scan/", views.product_scan, name="product_scan"),
+    path("scan/batch/", views.product_scan_batch, name="product_scan_batch"),
     path("add/", views.product_create, name="product_create"),
     path("<int:pk>/edit/", views.product_update, name="product_update"),
     path("<int:pk>/delete/", views.product_delete, name="product_delete"),
@@ -11,6 +14,7 @@ urlpatterns = [
     views.product_label_pdf,
     name="product_label_pdf"
 ),
+path("labels/", views.product_label_batch, name="product_label_batch"),
 path("products/<int:pk>/print/", views.product_print_label, name="product_print"),
 path("<int:pk>/print-label/", views.product_print_label, name="product_print_label"),
 
@@ -1,24 +1,73 @@
+import tempfile
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 
+from core.pagination import json_page, paginate, wants_json
+from core.db_routers import reporting
+from core.querybudget import query_budget
+
+from . import scan, search
 from .models import Product
 from .forms import ProductForm
 
 
 from reportlab.lib.pagesizes import A4
 
-from django.http import HttpResponse
+from django.http import FileResponse, HttpResponse, HttpResponseBadRequest, JsonResponse
+from django.utils.dateparse import parse_date
 from reportlab.lib.pagesizes import mm
 from reportlab.pdfgen import canvas
+from reportlab.graphics import renderPDF
+from reportlab.graphics.barcode.qr import QrCodeWidget
+from reportlab.graphics.shapes import Drawing
 
 
 
 @login_required
+@reporting
+@query_budget(5)
 def product_list(request):
-    products = Product.objects.all().order_by("-created_at")
+    products = paginate(request, Product.objects.all(), key="created_at")
+    if wants_json(request):
+        return json_page(products, lambda p: {
+            "id": p.id,
+            "name": p.name,
+            "code": p.code,
+            "stock": p.stock,
+            "selling_price_per_kg": p.selling_price_per_kg,
+            "created_at": p.created_at,
+        })
     return render(request, "inventory/product_list.html", {"products": products})
 
 
+@login_required
+@query_budget(3)
+def product_search(request):
+    """JSON for the product pickers, see inventory.search for the parameters."""
+    return JsonResponse(search.search(request.GET))
+
+
+@login_required
+@query_budget(3)
+def product_scan(request):
+    """Resolve one scanned label code: ?code=<QR code or 8-digit ID>."""
+    result = scan.resolve(request.GET.get("code", ""))
+    return JsonResponse(result, status=404 if "error" in result else 200)
+
+
+@login_required
+@query_budget(3)
+def product_scan_batch(request):
+    """
+    Resolve a basket of scans in one call: code=... repeated, or
+    comma/whitespace separated, by GET or POST.
+    """
+    params = request.POST if request.method == "POST" else request.GET
+    codes = [code for value in params.getlist("code") for code in value.replace(",", " ").split()]
+    return JsonResponse({"results": scan.resolve_many(codes)})
+
+
 @login_required
 def product_create(request):
     if request.method == "POST":
@@ -54,45 +103,122 @@ def product_delete(request, pk):
 
 
 
+# --------------------------------------------------------
+# 80mm x 50mm PRODUCT LABELS
+# --------------------------------------------------------
+LABEL_WIDTH = 80 * mm
+LABEL_HEIGHT = 50 * mm
+QR_SIZE = 22 * mm
+
+
+def draw_label(p, product, x=0, y=0):
+    """Draw one 80x50mm label with its bottom-left corner at (x, y)."""
+    top = y + LABEL_HEIGHT - 10
+
+    p.setFont("Helvetica-Bold", 10)
+    p.drawCentredString(x + LABEL_WIDTH / 2, top, "MEAT PRODUCT LABEL")
+    top -= 10
+
+    p.setFont("Helvetica", 9)
+    for line in (
+        f"Animal: {product.animal_type}",
+        f"Meat: {product.meat_type}",
+        f"Weight: {product.weight_kg} kg",
+        f"Price/kg: P{product.selling_price_per_kg}",
+        f"Total: P{product.total_selling_price}",
+        f"Packed: {product.created_at.date()}",
+    ):
+        p.drawString(x + 5, top, line)
+        top -= 8
+
+    top -= 2
+    p.setFont("Helvetica", 7)
+    p.drawString(x + 5, top, f"ID: {str(product.code)[:8]}")
+
+    # Full code as a QR, for the scanner at the counter.
+    qr = QrCodeWidget(str(product.code))
+    x1, y1, x2, y2 = qr.getBounds()
+    drawing = Drawing(QR_SIZE, QR_SIZE, transform=[QR_SIZE / (x2 - x1), 0, 0, QR_SIZE / (y2 - y1), 0, 0])
+    drawing.add(qr)
+    renderPDF.draw(drawing, p, x + LABEL_WIDTH - QR_SIZE - 3, y + 3)
+
+
 def product_label_pdf(request, pk):
     product = get_object_or_404(Product, pk=pk)
 
-    # 80mm x 50mm label
-    width = 80 * mm
-    height = 50 * mm
-
     response = HttpResponse(content_type="application/pdf")
     response["Content-Disposition"] = (
         f'inline; filename="label_{product.code}.pdf"'
     )
 
-    p = canvas.Canvas(response, pagesize=(width, height))
-
-    y = height - 10
+    p = canvas.Canvas(response, pagesize=(LABEL_WIDTH, LABEL_HEIGHT))
+    draw_label(p, product)
+    p.save()
+    return response
 
-    p.setFont("Helvetica-Bold", 10)
-    p.drawCentredString(width / 2, y, "MEAT PRODUCT LABEL")
-    y -= 10
 
-    p.setFont("Helvetica", 9)
-    p.drawString(5, y, f"Animal: {product.animal_type}")
-    y -= 8
-    p.drawString(5, y, f"Meat: {product.meat_type}")
-    y -= 8
-    p.drawString(5, y, f"Weight: {product.weight_kg} kg")
-    y -= 8
-    p.drawString(5, y, f"Price/kg: P{product.selling_price_per_kg}")
-    y -= 8
-    p.drawString(5, y, f"Total: P{product.total_selling_price}")
-    y -= 8
-    p.drawString(5, y, f"Packed: {product.created_at.date()}")
-
-    y -= 10
-    p.setFont("Helvetica", 7)
-    p.drawString(5, y, f"ID: {str(product.code)[:8]}")
+@login_required
+def product_label_batch(request):
+    """
+    Many labels in one PDF: ?ids=1&ids=2 (or ids=1,2) and/or ?start=&end=
+    on the packing date. layout=sheet puts 2 x 5 labels on each A4 page,
+    layout=roll gives one label per page for a continuous label printer.
+    """
+    ids = [pk for value in request.GET.getlist("ids") for pk in value.split(",") if pk.isdigit()]
+    try:
+        start = parse_date(request.GET.get("start") or "")
+        end = parse_date(request.GET.get("end") or "")
+    except ValueError:
+        return HttpResponseBadRequest("Invalid start/end date.")
+    layout = request.GET.get("layout", "sheet")
+
+    if not (ids or start or end):
+        return HttpResponseBadRequest("Pass ids or a start/end date.")
+
+    products = Product.objects.order_by("created_at", "id")
+    if ids:
+        products = products.filter(pk__in=ids)
+    if start:
+        products = products.filter(created_at__date__gte=start)
+    if end:
+        products = products.filter(created_at__date__lte=end)
+
+    # ReportLab needs somewhere to write; spool to disk past a few MB and
+    # stream the finished file out.
+    output = tempfile.SpooledTemporaryFile(max_size=4 * 1024 * 1024)
+
+    if layout == "roll":
+        p = canvas.Canvas(output, pagesize=(LABEL_WIDTH, LABEL_HEIGHT))
+        for product in products.iterator(chunk_size=500):
+            draw_label(p, product)
+            p.showPage()
+    else:
+        page_width, page_height = A4
+        columns, rows = 2, 5
+        margin_x = (page_width - columns * LABEL_WIDTH) / 2
+        margin_y = (page_height - rows * LABEL_HEIGHT) / 2
+        per_page = columns * rows
+
+        p = canvas.Canvas(output, pagesize=A4)
+        count = 0
+        for count, product in enumerate(products.iterator(chunk_size=500), start=1):
+            slot = (count - 1) % per_page
+            column, row = slot % columns, slot // columns
+            draw_label(
+                p,
+                product,
+                margin_x + column * LABEL_WIDTH,
+                page_height - margin_y - (row + 1) * LABEL_HEIGHT,
+            )
+            if count % per_page == 0:
+                p.showPage()
+        if count % per_page:
+            p.showPage()
 
     p.save()
-    return response
+    output.seek(0)
+    return FileResponse(output, content_type="application/pdf", filename="labels.pdf")
+
 
 @login_required
 def product_print_label(request, pk):
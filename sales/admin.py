@@ -1,8 +1,119 @@
 # sales/admin.py
-from django.contrib import admin
+from collections import defaultdict
+
+from django.contrib import admin, messages
+from django.db import transaction
+from django.http import HttpResponseRedirect
+
+from core.admin import EstimatedCountAdmin
+
+from . import stock
 from .models import CustomerOrder, CustomerOrderItem, PurchaseOrder, PurchaseOrderItem
 
-admin.site.register(CustomerOrder)
-admin.site.register(CustomerOrderItem)
-admin.site.register(PurchaseOrder)
-admin.site.register(PurchaseOrderItem)
+
+class CustomerOrderItemInline(admin.TabularInline):
+    model = CustomerOrderItem
+    extra = 1
+    autocomplete_fields = ("product",)
+
+
+class PurchaseOrderItemInline(admin.TabularInline):
+    model = PurchaseOrderItem
+    extra = 1
+    autocomplete_fields = ("product",)
+
+
+class StockShortageMixin:
+    """Roll the whole change back when saving it ran out of stock (obj._stock_shortage)."""
+
+    def _shortage_response(self, request, obj):
+        shortage = getattr(obj, "_stock_shortage", None)
+        if shortage:
+            # Still inside the admin's transaction: throw the change away.
+            transaction.set_rollback(True)
+            self.message_user(request, f"Not enough stock, nothing saved. {shortage}", messages.ERROR)
+            return HttpResponseRedirect(request.path)
+        return None
+
+    def response_add(self, request, obj, post_url_continue=None):
+        return self._shortage_response(request, obj) or super().response_add(request, obj, post_url_continue)
+
+    def response_change(self, request, obj):
+        return self._shortage_response(request, obj) or super().response_change(request, obj)
+
+
+@admin.register(CustomerOrder)
+class CustomerOrderAdmin(StockShortageMixin, EstimatedCountAdmin):
+    inlines = [CustomerOrderItemInline]
+    list_display = ("__str__", "date", "status", "total_amount")
+    list_select_related = ("customer",)
+    list_filter = ("status",)
+    autocomplete_fields = ("customer",)
+    search_fields = ("=id",)
+    ordering = ("-id",)
+
+    def save_related(self, request, form, formsets, change):
+        order = form.instance
+        before = stock.quantities(order.items.all()) if change else {}
+        super().save_related(request, form, formsets, change)
+        # Added lines and raised quantities come out of stock, all or nothing;
+        # removed lines and lowered quantities go back.
+        try:
+            stock.sell_changes(before, stock.quantities(order.items.all()), reference=f"Order #{order.pk}")
+        except stock.InsufficientStock as e:
+            order._stock_shortage = e
+
+
+@admin.register(CustomerOrderItem)
+class CustomerOrderItemAdmin(StockShortageMixin, EstimatedCountAdmin):
+    list_display = ("id", "order", "product", "quantity", "price")
+    list_select_related = ("order__customer", "product")
+    autocomplete_fields = ("order", "product")
+    ordering = ("-id",)
+
+    def save_model(self, request, obj, form, change):
+        before = stock.quantities(CustomerOrderItem.objects.filter(pk=obj.pk)) if change else {}
+        super().save_model(request, obj, form, change)
+        after = stock.quantities(CustomerOrderItem.objects.filter(pk=obj.pk))
+        try:
+            stock.sell_changes(before, after, reference=f"Order #{obj.order_id}")
+        except stock.InsufficientStock as e:
+            obj._stock_shortage = e
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            stock.restock({obj.product_id: obj.quantity}, reference=f"Order #{obj.order_id}", note="Line removed")
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        lines = list(queryset.values_list("order_id", "product_id", "quantity"))
+        returned = defaultdict(int)
+        for _, product_id, quantity in lines:
+            returned[product_id] += quantity
+        with transaction.atomic():
+            stock.restock(
+                returned, note="Line removed",
+                movements=[(product_id, quantity, f"Order #{order_id}") for order_id, product_id, quantity in lines],
+            )
+            super().delete_queryset(request, queryset)
+
+
+@admin.register(PurchaseOrder)
+class PurchaseOrderAdmin(EstimatedCountAdmin):
+    inlines = [PurchaseOrderItemInline]
+    list_display = ("__str__", "date", "status", "total_amount")
+    list_select_related = ("supplier",)
+    list_filter = ("status",)
+    date_hierarchy = "date"
+    autocomplete_fields = ("supplier",)
+    readonly_fields = ("total_amount",)  # moved by its lines (sales.totals)
+    search_fields = ("=id",)
+    ordering = ("-date", "-id")
+
+
+@admin.register(PurchaseOrderItem)
+class PurchaseOrderItemAdmin(EstimatedCountAdmin):
+    list_display = ("id", "purchase_order", "product", "quantity", "cost_price")
+    list_select_related = ("purchase_order__supplier", "product")
+    autocomplete_fields = ("purchase_order", "product")
+    ordering = ("-id",)
@@ -0,0 +1,288 @@
+"""
+Sales facts as partitioned Parquet for margin and yield analysis.
+
+One row per invoice line, denormalized with the product (animal and meat
+type, weight, cost and selling price per kg), the customer and the
+invoice's payment state, written under SALES_FACTS_DIR as
+
+    month=YYYY-MM/part-0.parquet
+
+so pandas / polars / DuckDB can read the directory as one hive-partitioned
+dataset. Amounts are float64; the database stays the book of record.
+
+export() is incremental: a fingerprint of every month (line and invoice
+counts, highest ids, sums of quantities, prices, product prices and
+payments) is computed with two grouped queries and compared with
+_manifest.json from the last run. Only months whose fingerprint changed
+are rewritten, months with no invoices left are removed. A customer
+rename does not change a fingerprint; export(full=True) rewrites
+everything.
+
+pyarrow is optional: without it export() raises ParquetUnavailable.
+"""
+import hashlib
+import json
+import os
+import shutil
+from datetime import date
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Max, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import Invoice, InvoiceItem
+
+# Bump when COLUMNS change: every month is rewritten on the next run.
+SCHEMA_VERSION = 1
+MANIFEST = "_manifest.json"
+PART = "part-0.parquet"
+
+# (column, arrow type name, values_list path); None = computed in _fact()
+COLUMNS = [
+    ("invoice_id", "int64", "invoice_id"),
+    ("invoice_number", "string", "invoice__number"),
+    ("invoice_date", "date32", "invoice__date"),
+    ("invoice_status", "string", "invoice__status"),
+    ("invoice_total", "float64", "invoice__total_amount"),
+    ("amount_received", "float64", "invoice__amount_received"),
+    ("balance_due", "float64", "invoice__balance_due"),
+    ("customer_id", "int64", "invoice__customer_id"),
+    ("customer_name", "string", "invoice__customer__name"),
+    ("line_id", "int64", "id"),
+    ("product_id", "int64", "product_id"),
+    ("product_code", "string", "product__code"),
+    ("animal_type", "string", "product__animal_type"),
+    ("meat_type", "string", "product__meat_type"),
+    ("weight_kg", "float64", "product__weight_kg"),
+    ("cost_price_per_kg", "float64", "product__cost_price_per_kg"),
+    ("selling_price_per_kg", "float64", "product__selling_price_per_kg"),
+    ("quantity", "int64", "quantity"),
+    ("price", "float64", "price"),
+    ("line_total", "float64", None),  # quantity * price
+    ("line_cost", "float64", None),   # quantity * weight_kg * cost_price_per_kg
+    ("line_margin", "float64", None),
+]
+_PATHS = [path for _, _, path in COLUMNS if path]
+
+
+class ParquetUnavailable(Exception):
+    pass
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ParquetUnavailable("The sales facts export needs pyarrow installed.") from None
+    return pyarrow
+
+
+def available():
+    try:
+        _pyarrow()
+    except ParquetUnavailable:
+        return False
+    return True
+
+
+def directory():
+    return Path(settings.SALES_FACTS_DIR)
+
+
+def _month_key(value):
+    return f"{value:%Y-%m}"
+
+
+def _month_range(key):
+    year, month = map(int, key.split("-"))
+    start = date(year, month, 1)
+    end = date(year + month // 12, month % 12 + 1, 1)
+    return start, end
+
+
+# --------------------------------------------------------
+# FINGERPRINTS
+# --------------------------------------------------------
+def _sum(expression):
+    return Sum(ExpressionWrapper(expression, output_field=DecimalField()))
+
+
+def fingerprints():
+    """{"YYYY-MM": hash} of everything that ends up in each month's facts."""
+    parts = {}
+
+    lines = (
+        InvoiceItem.objects
+        .annotate(month=TruncMonth("invoice__date"))
+        .values("month")
+        .annotate(
+            lines=Count("id"),
+            last_line=Max("id"),
+            units=Sum("quantity"),
+            total=_sum(F("quantity") * F("price")),
+            weight=_sum(F("quantity") * F("product__weight_kg")),
+            cost=_sum(F("quantity") * F("product__cost_price_per_kg")),
+            selling=_sum(F("quantity") * F("product__selling_price_per_kg")),
+        )
+        .order_by()
+    )
+    for row in lines:
+        month = row.pop("month")
+        parts.setdefault(_month_key(month), []).append(sorted(row.items()))
+
+    invoices = (
+        Invoice.objects
+        .annotate(month=TruncMonth("date"))
+        .values("month")
+        .annotate(
+            invoices=Count("id"),
+            last_invoice=Max("id"),
+            total=Sum("total_amount"),
+            received=Sum("amount_received"),
+            balance=Sum("balance_due"),
+            paid=Count("id", filter=Q(status="Paid")),
+            cancelled=Count("id", filter=Q(status="Cancelled")),
+        )
+        .order_by()
+    )
+    for row in invoices:
+        month = row.pop("month")
+        parts.setdefault(_month_key(month), []).append(sorted(row.items()))
+
+    return {
+        month: hashlib.sha256(repr([SCHEMA_VERSION, *sorted(map(repr, values))]).encode()).hexdigest()
+        for month, values in parts.items()
+    }
+
+
+def read_manifest():
+    try:
+        with open(directory() / MANIFEST, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {"schema": SCHEMA_VERSION, "months": {}}
+    if manifest.get("schema") != SCHEMA_VERSION:
+        manifest["months"] = {}
+    return manifest
+
+
+def _write_manifest(manifest):
+    path = directory() / MANIFEST
+    tmp = path.with_name(f".{MANIFEST}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+# --------------------------------------------------------
+# WRITING
+# --------------------------------------------------------
+def _float(value):
+    return None if value is None else float(value)
+
+
+def _fact(values):
+    row = dict(zip(_PATHS, values))
+    if row["product__code"] is not None:
+        row["product__code"] = str(row["product__code"])
+    quantity = row["quantity"]
+    line_total = quantity * row["price"]
+    # A deleted product leaves the line (SET_NULL) without a cost.
+    line_cost = line_margin = None
+    if row["product_id"] is not None:
+        line_cost = quantity * row["product__weight_kg"] * row["product__cost_price_per_kg"]
+        line_margin = line_total - line_cost
+    return [
+        _float(row[path]) if kind == "float64" and path else row[path]
+        for _, kind, path in COLUMNS if path
+    ] + [float(line_total), _float(line_cost), _float(line_margin)]
+
+
+def _schema(pa):
+    return pa.schema([(name, getattr(pa, kind)()) for name, kind, _ in COLUMNS])
+
+
+def _table(pa, schema, rows):
+    if not rows:
+        return schema.empty_table()
+    columns = zip(*rows)
+    return pa.Table.from_arrays(
+        [pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema
+    )
+
+
+def write_month(month):
+    """Write one month's facts to its partition; returns the number of rows."""
+    pa = _pyarrow()
+    schema = _schema(pa)
+    chunk_size = settings.EXPORT_CHUNK_SIZE
+    start, end = _month_range(month)
+
+    partition = directory() / f"month={month}"
+    partition.mkdir(parents=True, exist_ok=True)
+    tmp = partition / f".{PART}.tmp"
+
+    lines = (
+        InvoiceItem.objects
+        .filter(invoice__date__gte=start, invoice__date__lt=end)
+        .order_by("invoice__date", "invoice_id", "id")
+        .values_list(*_PATHS)
+    )
+    count = 0
+    batch = []
+    with pa.parquet.ParquetWriter(tmp, schema, compression="zstd") as writer:
+        for values in lines.iterator(chunk_size=chunk_size):
+            batch.append(_fact(values))
+            if len(batch) == chunk_size:
+                writer.write_table(_table(pa, schema, batch))
+                count += len(batch)
+                batch = []
+        if batch or not count:
+            writer.write_table(_table(pa, schema, batch))
+            count += len(batch)
+    os.replace(tmp, partition / PART)
+    return count
+
+
+def export(full=False):
+    """
+    Bring SALES_FACTS_DIR up to date. Returns {"written": {month: rows},
+    "unchanged": [months], "removed": [months]}.
+    """
+    _pyarrow()
+    directory().mkdir(parents=True, exist_ok=True)
+
+    manifest = read_manifest()
+    previous = {} if full else manifest["months"]
+    current = fingerprints()
+
+    written = {}
+    for month, fingerprint in sorted(current.items()):
+        if previous.get(month, {}).get("fingerprint") == fingerprint:
+            continue
+        written[month] = write_month(month)
+        manifest["months"][month] = {
+            "fingerprint": fingerprint,
+            "rows": written[month],
+            "written_at": timezone.now().isoformat(timespec="seconds"),
+        }
+        # Saved after every month so an interrupted run resumes where it stopped.
+        manifest["schema"] = SCHEMA_VERSION
+        _write_manifest(manifest)
+
+    on_disk = {path.name.split("=", 1)[1] for path in directory().glob("month=*")}
+    removed = sorted((set(manifest["months"]) | on_disk) - set(current))
+    for month in removed:
+        shutil.rmtree(directory() / f"month={month}", ignore_errors=True)
+        manifest["months"].pop(month, None)
+    manifest["schema"] = SCHEMA_VERSION
+    _write_manifest(manifest)
+
+    return {
+        "written": written,
+        "unchanged": sorted(set(current) - set(written)),
+        "removed": removed,
+    }
@@ -0,0 +1,103 @@
+"""
+Turning quotations into invoices.
+
+convert_many() converts any number of quotations in one transaction: the
+invoice numbers are reserved in one go, invoices and their lines go in
+with two bulk_create() calls, and the lines of all of them come out of
+stock (sales.stock) with one UPDATE before anything is committed. A
+quotation that already has an invoice is not converted again; its
+existing invoice is returned.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+
+from . import kpis, stock
+from .models import DocumentSequence, Invoice, InvoiceItem, Quotation, QuotationItem
+
+
+def _lock(quotation_ids):
+    # A no-op UPDATE takes the write lock on these rows (and on SQLite the
+    # database) before the existing-invoice check, so two requests
+    # converting the same quotation cannot both see "not converted yet".
+    Quotation.objects.filter(pk__in=quotation_ids).update(status=F("status"))
+
+
+def convert_many(quotations):
+    """
+    Convert `quotations` (a queryset or list of Quotation) and return
+    (created invoices, existing invoices), each a list of Invoice.
+    Raises sales.stock.InsufficientStock and converts nothing if any
+    invoice's lines are not in stock.
+    """
+    quotation_ids = [q.pk for q in quotations]
+    if not quotation_ids:
+        return [], []
+
+    with transaction.atomic():
+        _lock(quotation_ids)
+
+        existing = {}
+        for invoice in Invoice.objects.filter(quotation_id__in=quotation_ids).order_by("id"):
+            existing.setdefault(invoice.quotation_id, invoice)
+
+        todo = list(
+            Quotation.objects.filter(pk__in=quotation_ids)
+            .exclude(pk__in=existing)
+            .order_by("id")
+        )
+        if not todo:
+            return [], list(existing.values())
+
+        lines = {}
+        for item in QuotationItem.objects.filter(quotation__in=todo).order_by("id"):
+            lines.setdefault(item.quotation_id, []).append(item)
+
+        numbers = DocumentSequence.reserve("invoice", len(todo))
+        invoices = []
+        for quotation, number in zip(todo, numbers):
+            total = sum(
+                (item.quantity * item.price for item in lines.get(quotation.pk, [])),
+                Decimal("0"),
+            )
+            invoices.append(Invoice(
+                customer_id=quotation.customer_id,
+                quotation=quotation,
+                number=number,
+                status="Unpaid",
+                total_amount=total,
+                balance_due=total,
+            ))
+        # bulk_create() skips Invoice.save() and the item signals, so the
+        # number, total and balance are all filled in above.
+        Invoice.objects.bulk_create(invoices)
+
+        InvoiceItem.objects.bulk_create([
+            InvoiceItem(invoice=invoice, product_id=item.product_id, quantity=item.quantity, price=item.price)
+            for invoice in invoices
+            for item in lines.get(invoice.quotation_id, [])
+        ])
+
+        # Every new invoice's lines out of stock with one UPDATE.
+        wanted = defaultdict(int)
+        movements = []
+        for invoice in invoices:
+            for item in lines.get(invoice.quotation_id, []):
+                if item.product_id is not None and item.quantity:
+                    wanted[item.product_id] += item.quantity
+                    movements.append((item.product_id, -item.quantity, invoice.number))
+        stock.deduct(wanted, movements=movements)
+
+        transaction.on_commit(kpis.invalidate)
+
+    return invoices, list(existing.values())
+
+
+def convert(quotation):
+    """Convert one quotation. Returns (invoice, created)."""
+    created, existing = convert_many([quotation])
+    if created:
+        return created[0], True
+    return existing[0], False
@@ -0,0 +1,37 @@
+"""
+HTML for the printable sales documents, shared by the single PDF downloads
+and the bulk ZIP export.
+"""
+from django.template.loader import render_to_string
+
+COMPANY = {
+    "name": "Ed-Tech Africa Innovation College",
+    "address": "Barclays House, Main Mall, Gaborone, Botswana",
+    "phone": "+267 71 234 567",
+    "email": "info@edtechafrica.co.bw",
+}
+
+
+def quotation_html(quotation):
+    return render_to_string("sales/pdf/quotation.html", {
+        "quotation": quotation,
+        "company": COMPANY,
+        "title": "QUOTATION",
+    })
+
+
+def invoice_html(invoice):
+    return render_to_string("sales/pdf/invoice.html", {
+        "invoice": invoice,
+        "company": COMPANY,
+        "title": "INVOICE",
+    })
+
+
+def receipt_html(receipt):
+    return render_to_string("sales/pdf/receipt.html", {
+        "receipt": receipt,
+        "invoice": receipt.invoice,
+        "company": COMPANY,
+        "title": "RECEIPT",
+    })
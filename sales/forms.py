@@ -1,4 +1,6 @@
 from django import forms
+
+from core.widgets import SearchSelect
 from .models import (
     PurchaseOrder, PurchaseOrderItem,
     Quotation, QuotationItem,
@@ -13,6 +15,10 @@ class QuotationForm(forms.ModelForm):
     class Meta:
         model = Quotation
         fields = ["customer", "status"]
+        widgets = {
+            # Only the chosen customer is rendered; see core.widgets.
+            "customer": SearchSelect("customer_search"),
+        }
 
 
 class QuotationItemForm(forms.ModelForm):
@@ -25,6 +31,10 @@ class InvoiceForm(forms.ModelForm):
     class Meta:
         model = Invoice
         fields = ["customer", "status"]
+        widgets = {
+            # Only the chosen customer is rendered; see core.widgets.
+            "customer": SearchSelect("customer_search"),
+        }
 
 
 class InvoiceItemForm(forms.ModelForm):
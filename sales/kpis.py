@@ -0,0 +1,91 @@
+"""
+Headline numbers shared by the dashboard, the purchases tab and the sales
+summary.
+
+Everything is computed with one conditional aggregate per table and cached
+under a version number. sales.signals bumps the version whenever a sales
+document changes, so a dashboard hit with nothing new is a single
+cache.get_many() call. The cache is shared by all workers (CACHES in
+core.settings), so a write in one is seen by the others.
+"""
+import time
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from core.db_routers import primary
+from crm.models import Customer
+
+from .models import Invoice, MonthlySalesRollup, PurchaseOrder, Quotation
+
+VERSION_KEY = "sales:kpis:version"
+PAYLOAD_KEY = "sales:kpis:payload"
+TIMEOUT = 60 * 60
+
+
+def _new_version():
+    # Time based, so a version key lost to eviction never comes back as an
+    # old number that still matches a cached payload.
+    return time.time_ns()
+
+
+def invalidate():
+    """Mark every cached KPI payload as stale."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, _new_version(), None)
+
+
+def compute():
+    invoices = Invoice.objects.aggregate(
+        total_invoices=Count("id"),
+        unpaid_invoices=Count("id", filter=Q(status__in=Invoice.OPEN_STATUSES)),
+    )
+    quotations = Quotation.objects.aggregate(
+        total_quotations=Count("id"),
+        pending_quotations=Count("id", filter=Q(status__in=["Draft", "Sent"])),
+    )
+    purchase_orders = PurchaseOrder.objects.aggregate(
+        pending_purchase_orders=Count("id", filter=Q(status="Pending")),
+    )
+    # Receipts and received POs are already summed up per month in the
+    # rollups, which also feed the dashboard charts.
+    months = list(MonthlySalesRollup.objects.order_by("month"))
+
+    return {
+        **invoices,
+        **quotations,
+        **purchase_orders,
+        "total_sales": sum(m.sales_total for m in months),
+        "total_receipts": sum(m.receipt_count for m in months),
+        "total_purchases": sum(m.purchases_total for m in months),
+        "total_customers": Customer.objects.count(),
+        "sales_by_month": [
+            (m.month.strftime("%b %Y"), float(m.sales_total))
+            for m in months if m.receipt_count
+        ],
+        "purchases_by_month": [
+            (m.month.strftime("%b %Y"), float(m.purchases_total))
+            for m in months if m.purchase_order_count
+        ],
+    }
+
+
+def get_kpis():
+    cached = cache.get_many([VERSION_KEY, PAYLOAD_KEY])
+    version = cached.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, _new_version(), None)
+        version = cache.get(VERSION_KEY)
+
+    payload = cached.get(PAYLOAD_KEY)
+    if payload is not None and payload["version"] == version:
+        return payload["kpis"]
+
+    # From the primary even on a replica-routed page: the payload is
+    # cached until the next write, so it must already include that write.
+    with primary():
+        kpis = compute()
+    cache.set(PAYLOAD_KEY, {"version": version, "kpis": kpis}, TIMEOUT)
+    return kpis
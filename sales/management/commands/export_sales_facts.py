@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from sales import analytics
+
+
+class Command(BaseCommand):
+    help = "Write the months of sales facts that changed since the last run as Parquet."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Rewrite every month, not only the ones that changed.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            result = analytics.export(full=options["full"])
+        except analytics.ParquetUnavailable as exc:
+            raise CommandError(str(exc))
+
+        for month, rows in result["written"].items():
+            self.stdout.write(f"month={month}: {rows} line(s)")
+        for month in result["removed"]:
+            self.stdout.write(f"month={month}: removed")
+        self.stdout.write(self.style.SUCCESS(
+            f"{analytics.directory()}: {len(result['written'])} month(s) written, "
+            f"{len(result['unchanged'])} unchanged, {len(result['removed'])} removed."
+        ))
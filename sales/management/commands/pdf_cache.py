@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from sales import pdf_cache
+
+
+class Command(BaseCommand):
+    help = "Show, trim or purge the rendered PDF cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--purge", action="store_true", help="Delete every cached PDF.")
+        parser.add_argument(
+            "--max-bytes",
+            type=int,
+            help="Evict least recently used PDFs until the cache fits in this many bytes.",
+        )
+
+    def handle(self, *args, **options):
+        if options["purge"]:
+            removed = pdf_cache.purge()
+            self.stdout.write(self.style.SUCCESS(f"Purged {removed} PDF(s)."))
+        elif options["max_bytes"] is not None:
+            removed = pdf_cache.evict(options["max_bytes"])
+            self.stdout.write(self.style.SUCCESS(f"Evicted {removed} PDF(s)."))
+
+        stats = pdf_cache.stats()
+        self.stdout.write(
+            f"{stats['directory']}: {stats['files']} file(s), "
+            f"{stats['bytes'] / 1024 / 1024:.1f} MB of {stats['max_bytes'] / 1024 / 1024:.0f} MB"
+        )
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from sales import rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily and monthly dashboard rollups from receipts and purchase orders."
+
+    def handle(self, *args, **options):
+        days, months = rollups.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt rollups: {days} day(s), {months} month(s)."
+        ))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from sales import kpis, payments
+
+
+class Command(BaseCommand):
+    help = "Recompute every invoice's amount received, balance due and status from its receipts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report invoices whose stored amounts have drifted.",
+        )
+
+    def handle(self, *args, **options):
+        drifted = payments.drifted_invoices().only(
+            "number", "total_amount", "amount_received", "balance_due"
+        )
+        count = 0
+        for invoice in drifted.iterator():
+            count += 1
+            self.stdout.write(
+                f"{invoice.number}: received {invoice.amount_received} "
+                f"(receipts say {invoice.actual_received}), "
+                f"balance {invoice.balance_due} "
+                f"(should be {invoice.total_amount - invoice.actual_received})"
+            )
+
+        if options["dry_run"]:
+            self.stdout.write(f"{count} invoice(s) drifted.")
+            return
+
+        updated = payments.reconcile()
+        kpis.invalidate()
+        self.stdout.write(self.style.SUCCESS(
+            f"Reconciled {updated} invoice(s), {count} had drifted."
+        ))
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:41
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def build_rollups(apps, schema_editor):
+    Receipt = apps.get_model("sales", "Receipt")
+    PurchaseOrder = apps.get_model("sales", "PurchaseOrder")
+    DailySalesRollup = apps.get_model("sales", "DailySalesRollup")
+    MonthlySalesRollup = apps.get_model("sales", "MonthlySalesRollup")
+
+    days = defaultdict(lambda: defaultdict(int))
+    for row in Receipt.objects.values("date").annotate(total=Sum("amount_paid"), count=Count("id")):
+        days[row["date"]]["sales_total"] += row["total"] or 0
+        days[row["date"]]["receipt_count"] += row["count"]
+    for row in PurchaseOrder.objects.filter(status="Received").values("date").annotate(
+        total=Sum("total_amount"), count=Count("id")
+    ):
+        days[row["date"]]["purchases_total"] += row["total"] or 0
+        days[row["date"]]["purchase_order_count"] += row["count"]
+
+    months = defaultdict(lambda: defaultdict(int))
+    for day, values in days.items():
+        for field, value in values.items():
+            months[day.replace(day=1)][field] += value
+
+    DailySalesRollup.objects.bulk_create(
+        DailySalesRollup(day=day, **values) for day, values in days.items()
+    )
+    MonthlySalesRollup.objects.bulk_create(
+        MonthlySalesRollup(month=month, **values) for month, values in months.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0004_alter_invoiceitem_product_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sales_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('receipt_count', models.IntegerField(default=0)),
+                ('purchases_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('purchase_order_count', models.IntegerField(default=0)),
+                ('day', models.DateField(unique=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='MonthlySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sales_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('receipt_count', models.IntegerField(default=0)),
+                ('purchases_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('purchase_order_count', models.IntegerField(default=0)),
+                ('month', models.DateField(unique=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
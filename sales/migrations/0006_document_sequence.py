@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:43
+
+from django.db import migrations, models
+
+
+def seed_sequences(apps, schema_editor):
+    # Carry on from the highest number (or id) already handed out.
+    DocumentSequence = apps.get_model("sales", "DocumentSequence")
+    for name, model in (("quotation", "Quotation"), ("invoice", "Invoice"), ("receipt", "Receipt")):
+        last_value = 0
+        for pk, number in apps.get_model("sales", model).objects.values_list("id", "number"):
+            suffix = (number or "").rsplit("-", 1)[-1]
+            last_value = max(last_value, pk, int(suffix) if suffix.isdigit() else 0)
+        DocumentSequence.objects.create(name=name, last_value=last_value)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0005_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=20, unique=True)),
+                ('last_value', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed_sequences, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:51
+
+from django.db import migrations, models
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_payment_columns(apps, schema_editor):
+    # Status is left alone here; run reconcile_invoices to re-derive it.
+    Invoice = apps.get_model("sales", "Invoice")
+    Receipt = apps.get_model("sales", "Receipt")
+    money = DecimalField(max_digits=12, decimal_places=2)
+    received = (
+        Receipt.objects.filter(invoice=OuterRef("pk"))
+        .values("invoice")
+        .annotate(total=Sum("amount_paid"))
+        .values("total")
+    )
+    Invoice.objects.update(
+        amount_received=Coalesce(Subquery(received, output_field=money), Value(0), output_field=money),
+    )
+    Invoice.objects.update(balance_due=F("total_amount") - F("amount_received"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0007_list_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='amount_received',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='balance_due',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.RunPython(fill_payment_columns, migrations.RunPython.noop),
+    ]
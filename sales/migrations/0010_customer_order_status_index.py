@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 21:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0004_search_index'),
+        ('sales', '0009_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customerorder',
+            index=models.Index(fields=['status', 'id'], name='sales_order_status_id_idx'),
+        ),
+    ]
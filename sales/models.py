@@ -1,8 +1,94 @@
-from django.db import models
+from decimal import Decimal
+
+from django.db import connection, models, transaction
 from crm.models import Customer, Supplier
 from inventory.models import Product
 
 
+# --------------------------------------------------------
+# DOCUMENT NUMBERS (Q-0001, INV-0001, RC-0001)
+# --------------------------------------------------------
+class DocumentSequence(models.Model):
+    PREFIXES = {
+        "quotation": "Q",
+        "invoice": "INV",
+        "receipt": "RC",
+    }
+
+    name = models.CharField(max_length=20, unique=True)
+    last_value = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.last_value}"
+
+    @classmethod
+    def format_number(cls, name, value):
+        return f"{cls.PREFIXES[name]}-{value:04d}"
+
+    @classmethod
+    def reserve(cls, name, count=1):
+        """
+        Atomically take the next `count` numbers for a document type and
+        return them formatted, e.g. ["INV-0042", "INV-0043"].
+
+        The row stays write-locked until the surrounding transaction ends, so
+        concurrent callers queue up behind each other instead of colliding.
+        """
+        if count < 1:
+            return []
+
+        # No savepoint: the caller's transaction already covers a failure.
+        with transaction.atomic(savepoint=False):
+            last = cls._increment(name, count)
+            if last is None:
+                cls.objects.get_or_create(name=name)
+                last = cls._increment(name, count)
+
+        return [cls.format_number(name, value) for value in range(last - count + 1, last + 1)]
+
+    @classmethod
+    def next_number(cls, name):
+        return cls.reserve(name)[0]
+
+    @classmethod
+    def _increment(cls, name, count):
+        if connection.features.can_return_columns_from_insert:
+            # UPDATE ... RETURNING: one round trip (SQLite 3.35+, PostgreSQL).
+            table = connection.ops.quote_name(cls._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"UPDATE {table} SET last_value = last_value + %s WHERE name = %s RETURNING last_value",
+                    [count, name],
+                )
+                row = cursor.fetchone()
+            return row[0] if row else None
+
+        if not cls.objects.filter(name=name).update(last_value=models.F("last_value") + count):
+            return None
+        return cls.objects.filter(name=name).values_list("last_value", flat=True).get()
+
+
+def fields_except(instance, kwargs, excluded):
+    """
+    Default a full save() of an existing row to every column but `excluded`:
+    columns kept up to date with F() updates elsewhere, which a possibly
+    stale instance must never write back.
+    """
+    if not instance._state.adding and kwargs.get("update_fields") is None:
+        kwargs["update_fields"] = [
+            f.name for f in instance._meta.concrete_fields
+            if not f.primary_key and f.name not in excluded
+        ]
+
+
+# Moved by line deltas in sales.totals.
+TOTAL_FIELDS = ("total_amount",)
+
+# Invoices still waiting for money. Also the condition of
+# sales_invoice_open_idx: a change needs a migration.
+OPEN_STATUSES = ("Unpaid", "Partially Paid")
+
+
 # --------------------------------------------------------
 # CUSTOMER ORDER (not related to purchase orders)
 # --------------------------------------------------------
@@ -15,6 +101,12 @@ class CustomerOrder(models.Model):
     def __str__(self):
         return f"Order #{self.id} - {self.customer.name}"
 
+    class Meta:
+        indexes = [
+            # the admin's status filter, newest first
+            models.Index(fields=["status", "id"], name="sales_order_status_id_idx"),
+        ]
+
 
 class CustomerOrderItem(models.Model):
     order = models.ForeignKey(CustomerOrder, related_name="items", on_delete=models.CASCADE)
@@ -45,6 +137,18 @@ class PurchaseOrder(models.Model):
     def __str__(self):
         return f"PO #{self.id} - {self.supplier.name}"
 
+    def save(self, *args, **kwargs):
+        fields_except(self, kwargs, TOTAL_FIELDS)
+        super().save(*args, **kwargs)
+
+    class Meta:
+        indexes = [
+            # keyset pagination of the list page (core.pagination)
+            models.Index(fields=["date", "id"], name="sales_po_date_id_idx"),
+            # pending / received orders by date
+            models.Index(fields=["status", "date", "id"], name="sales_po_status_date_idx"),
+        ]
+
 
 # --------------------------------------------------------
 # PURCHASE ORDER ITEMS
@@ -87,12 +191,23 @@ class Quotation(models.Model):
         return sum(item.line_total for item in self.items.all())
 
     def save(self, *args, **kwargs):
+        fields_except(self, kwargs, TOTAL_FIELDS)
         if not self.number:
-            last = Quotation.objects.order_by("-id").first()
-            next_id = (last.id + 1) if last else 1
-            self.number = f"Q-{next_id:04d}"
+            # Same transaction as the insert, so a failed save gives the number back.
+            with transaction.atomic():
+                self.number = DocumentSequence.next_number("quotation")
+                super().save(*args, **kwargs)
+            return
         super().save(*args, **kwargs)
 
+    class Meta:
+        indexes = [
+            # keyset pagination of the list page (core.pagination)
+            models.Index(fields=["date", "id"], name="sales_quotation_date_id_idx"),
+            # pending (Draft / Sent) quotations by date
+            models.Index(fields=["status", "date", "id"], name="sales_quote_status_date_idx"),
+        ]
+
 
 class QuotationItem(models.Model):
     quotation = models.ForeignKey(
@@ -132,25 +247,54 @@ class Invoice(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="Unpaid")
     total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
 
+    # Kept in step with the receipts by sales.payments
+    amount_received = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    balance_due = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    PAYMENT_FIELDS = ("amount_received", "balance_due")
+    OPEN_STATUSES = OPEN_STATUSES
+
     def __str__(self):
         return f"{self.number or 'Invoice'} - {self.customer.name}"
 
     def calculate_total(self):
         return sum(item.line_total for item in self.items.all())
 
-    def amount_received(self):
-        from django.db.models import Sum
-        return self.receipts.aggregate(total=Sum("amount_paid"))["total"] or 0
-
-    def balance_due(self):
-        return self.total_amount - self.amount_received()
-
     def save(self, *args, **kwargs):
+        adding = self._state.adding
+        if adding:
+            self.balance_due = Decimal(str(self.total_amount)) - Decimal(str(self.amount_received))
+        else:
+            # The payment columns belong to sales.payments (F() updates).
+            fields_except(self, kwargs, self.PAYMENT_FIELDS + TOTAL_FIELDS)
+
         if not self.number:
-            last = Invoice.objects.order_by("-id").first()
-            next_id = (last.id + 1) if last else 1
-            self.number = f"INV-{next_id:04d}"
-        super().save(*args, **kwargs)
+            # Same transaction as the insert, so a failed save gives the number back.
+            with transaction.atomic():
+                self.number = DocumentSequence.next_number("invoice")
+                super().save(*args, **kwargs)
+        else:
+            super().save(*args, **kwargs)
+
+        written = kwargs.get("update_fields") or ()
+        if not adding and ("total_amount" in written or "status" in written):
+            from .payments import refresh_balance
+            refresh_balance(self.pk)
+            self.refresh_from_db(fields=self.PAYMENT_FIELDS + TOTAL_FIELDS + ("status",))
+
+    class Meta:
+        indexes = [
+            # keyset pagination of the list page (core.pagination)
+            models.Index(fields=["date", "id"], name="sales_invoice_date_id_idx"),
+            # lists / exports filtered by status, newest first
+            models.Index(fields=["status", "date", "id"], name="sales_invoice_status_date_idx"),
+            # only the invoices still waiting for money (OPEN_STATUSES)
+            models.Index(
+                fields=["date", "id"],
+                condition=models.Q(status__in=OPEN_STATUSES),
+                name="sales_invoice_open_idx",
+            ),
+        ]
 
 
 class InvoiceItem(models.Model):
@@ -198,7 +342,42 @@ class Receipt(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.number:
-            last = Receipt.objects.order_by("-id").first()
-            next_id = (last.id + 1) if last else 1
-            self.number = f"RC-{next_id:04d}"
+            # Same transaction as the insert, so a failed save gives the number back.
+            with transaction.atomic():
+                self.number = DocumentSequence.next_number("receipt")
+                super().save(*args, **kwargs)
+            return
         super().save(*args, **kwargs)
+
+    class Meta:
+        indexes = [
+            # keyset pagination of the list page (core.pagination)
+            models.Index(fields=["date", "id"], name="sales_receipt_date_id_idx"),
+        ]
+
+
+# --------------------------------------------------------
+# DASHBOARD ROLLUPS (kept up to date by sales.rollups)
+# --------------------------------------------------------
+class SalesRollup(models.Model):
+    sales_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    receipt_count = models.IntegerField(default=0)
+    purchases_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    purchase_order_count = models.IntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class DailySalesRollup(SalesRollup):
+    day = models.DateField(unique=True)
+
+    def __str__(self):
+        return f"Rollup {self.day}"
+
+
+class MonthlySalesRollup(SalesRollup):
+    month = models.DateField(unique=True)  # always the 1st of the month
+
+    def __str__(self):
+        return f"Rollup {self.month:%b %Y}"
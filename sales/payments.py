@@ -0,0 +1,73 @@
+"""
+Invoice.amount_received, Invoice.balance_due and the payment status.
+
+The columns are only ever moved with single UPDATE statements built from
+F() expressions, so two tills posting receipts against the same invoice
+cannot lose each other's payment. Status is derived in the same statement:
+Unpaid with nothing received, Paid once the balance is covered, Partially
+Paid in between. Cancelled invoices keep their status.
+"""
+from django.db.models import Case, DecimalField, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import LessThanOrEqual
+
+from .models import Invoice, Receipt
+
+
+def payment_update(received):
+    """UPDATE kwargs that set amount_received to `received` and derive the rest."""
+    balance = F("total_amount") - received
+    return {
+        "amount_received": received,
+        "balance_due": balance,
+        "status": Case(
+            When(status="Cancelled", then=F("status")),
+            When(LessThanOrEqual(received, 0), then=Value("Unpaid")),
+            When(LessThanOrEqual(balance, 0), then=Value("Paid")),
+            default=Value("Partially Paid"),
+        ),
+    }
+
+
+def add_payment(invoice_id, amount):
+    """Move an invoice's received amount by `amount` (negative to take it back)."""
+    if invoice_id is None or not amount:
+        return
+    Invoice.objects.filter(pk=invoice_id).update(
+        **payment_update(F("amount_received") + amount)
+    )
+
+
+def refresh_balance(invoice_id):
+    """Re-derive balance_due and status after total_amount changed."""
+    Invoice.objects.filter(pk=invoice_id).update(**payment_update(F("amount_received")))
+
+
+def received_subquery():
+    total = (
+        Receipt.objects.filter(invoice=OuterRef("pk"))
+        .values("invoice")
+        .annotate(total=Sum("amount_paid"))
+        .values("total")
+    )
+    return Coalesce(
+        Subquery(total, output_field=DecimalField(max_digits=12, decimal_places=2)),
+        Value(0),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
+def drifted_invoices():
+    """Invoices whose stored payment columns disagree with their receipts."""
+    return (
+        Invoice.objects.annotate(actual_received=received_subquery())
+        .exclude(
+            amount_received=F("actual_received"),
+            balance_due=F("total_amount") - F("actual_received"),
+        )
+    )
+
+
+def reconcile():
+    """Recompute the payment columns of every invoice in one UPDATE."""
+    return Invoice.objects.update(**payment_update(received_subquery()))
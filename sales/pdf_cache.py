@@ -0,0 +1,207 @@
+"""
+On-disk cache for the WeasyPrint PDFs (quotations, invoices, receipts).
+
+Files are addressed by a hash of the rendered HTML plus
+settings.PDF_TEMPLATE_VERSION, so any change to the document or its
+template produces a new entry and nothing ever needs invalidating. The
+hash doubles as the ETag. Least recently served files are evicted once
+the directory grows past settings.PDF_CACHE_MAX_BYTES.
+
+Checking that means listing the whole directory, so a write only triggers
+it when the size seen at the last check plus what this process has written
+since goes over the limit, or after EVICT_EVERY writes (other processes
+write too).
+"""
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.http import FileResponse, Http404
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from weasyprint import HTML
+
+EVICT_EVERY = 50
+
+_lock = threading.Lock()
+_known_bytes = None  # cache size at the last evict() plus writes since
+_writes = 0
+
+
+def cache_dir():
+    return Path(settings.PDF_CACHE_DIR)
+
+
+def cache_key(html):
+    data = f"{settings.PDF_TEMPLATE_VERSION}\0{html}".encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def path_for(key):
+    return cache_dir() / key[:2] / f"{key}.pdf"
+
+
+def get(key):
+    """Return the cached file for `key`, or None. Marks it as recently used."""
+    path = path_for(key)
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    # atime tracks recency for eviction, mtime stays the render time.
+    os.utime(path, (time.time(), stat.st_mtime))
+    return path
+
+
+def write(path, pdf):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    # Write to a temp file and rename, so readers never see half a PDF.
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(pdf)
+    os.replace(tmp, path)
+    return path
+
+
+def put(key, pdf):
+    """Store rendered PDF bytes under `key` and trim the cache to size."""
+    path = write(path_for(key), pdf)
+    written(len(pdf))
+    return path
+
+
+def written(size):
+    """Count `size` new bytes and evict if the cache may be over its limit."""
+    global _known_bytes, _writes
+    with _lock:
+        _writes += 1
+        if _known_bytes is not None:
+            _known_bytes += size
+        due = (
+            _known_bytes is None
+            or _known_bytes > settings.PDF_CACHE_MAX_BYTES
+            or _writes >= EVICT_EVERY
+        )
+    if due:
+        evict()
+
+
+def entries():
+    """(path, size, last_used) for every cached PDF."""
+    result = []
+    for path in cache_dir().glob("*/*.pdf"):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        result.append((path, stat.st_size, stat.st_atime))
+    return result
+
+
+def stats():
+    files = entries()
+    return {
+        "files": len(files),
+        "bytes": sum(size for _, size, _ in files),
+        "max_bytes": settings.PDF_CACHE_MAX_BYTES,
+        "directory": str(cache_dir()),
+    }
+
+
+def evict(max_bytes=None):
+    """Delete least recently used PDFs until the cache fits in `max_bytes`."""
+    global _known_bytes, _writes
+    if max_bytes is None:
+        max_bytes = settings.PDF_CACHE_MAX_BYTES
+
+    files = sorted(entries(), key=lambda entry: entry[2])
+    total = sum(size for _, size, _ in files)
+    removed = 0
+
+    for path, size, _ in files:
+        if total <= max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+        removed += 1
+
+    with _lock:
+        _known_bytes = total
+        _writes = 0
+    return removed
+
+
+def purge():
+    return evict(max_bytes=0)
+
+
+def render(html):
+    return HTML(string=html).write_pdf()
+
+
+def render_to_file(html, path):
+    """Render and store in one go; runs inside the sales.pdf_jobs workers."""
+    write(path, render(html))
+    return str(path)
+
+
+def pdf_response(request, html, filename=None):
+    """
+    Serve `html` as a PDF, rendering it only on a cache miss.
+
+    Honours If-None-Match / If-Modified-Since, so a browser that already has
+    this exact document gets a 304 without the file being read.
+    """
+    key = cache_key(html)
+    if get(key) is None:
+        response = get_conditional_response(request, etag=quote_etag(key))
+        if response is not None:
+            return _finish(response, key)
+        put(key, render(html))
+    try:
+        return file_response(request, key, filename=filename)
+    except Http404:
+        # Evicted again before it could be opened; serve a fresh render.
+        response = FileResponse(
+            io.BytesIO(render(html)), content_type="application/pdf", filename=filename
+        )
+        return _finish(response, key)
+
+
+def file_response(request, key, filename=None):
+    """Serve an already cached PDF (with conditional GET support)."""
+    path = get(key)
+    try:
+        # Once open, the file stays readable even if it is evicted.
+        f = open(path, "rb") if path is not None else None
+    except FileNotFoundError:
+        f = None
+    if f is None:
+        raise Http404("This PDF is no longer cached.")
+    last_modified = int(os.fstat(f.fileno()).st_mtime)
+
+    response = get_conditional_response(
+        request, etag=quote_etag(key), last_modified=last_modified
+    )
+    if response is None:
+        response = FileResponse(f, content_type="application/pdf", filename=filename)
+    else:
+        f.close()
+    return _finish(response, key, last_modified)
+
+
+def _finish(response, key, last_modified=None):
+    response.headers["ETag"] = quote_etag(key)
+    if last_modified is not None:
+        response.headers["Last-Modified"] = http_date(last_modified)
+    # Login-protected documents: keep them out of shared caches and make
+    # browsers revalidate, which is cheap thanks to the ETag.
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
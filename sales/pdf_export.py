@@ -0,0 +1,139 @@
+"""
+Bulk export of invoice and receipt PDFs as one ZIP file.
+
+Documents are read in chunks of EXPORT_CHUNK_SIZE, each with one prefetch
+pass (through a server-side cursor on PostgreSQL), and turned into HTML
+BATCH_SIZE at a time. Each batch is rendered in parallel on the
+sales.pdf_jobs pool and every PDF is written into the ZIP and flushed to
+the client as soon as it is ready, before the next batch's HTML is built.
+Neither the archive nor the documents are ever held in memory all at once.
+A document that fails to render is written as <name>.error.txt holding the
+error, so one bad document does not cut the download short.
+"""
+import zipfile
+from datetime import date
+from itertools import chain, islice
+
+from django.conf import settings
+
+from . import documents, pdf_cache, pdf_jobs
+from .models import Invoice, Receipt
+
+# Documents whose HTML is built ahead of rendering them.
+BATCH_SIZE = 50
+
+
+class _ZipStream:
+    """Write-only file object that collects what ZipFile writes between yields."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _parse_date(value):
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def export_filename(params):
+    """documents_<start>_<end>.zip, from the same dates filter_documents() uses."""
+    start = _parse_date(params.get("start"))
+    end = _parse_date(params.get("end"))
+    return f"documents_{start or 'all'}_{end or 'today'}.zip"
+
+
+def filter_documents(params):
+    """Invoices and receipts matching ?start=&end=&status=&include=."""
+    start = _parse_date(params.get("start"))
+    end = _parse_date(params.get("end"))
+    status = params.get("status")
+    include = (params.get("include") or "invoices,receipts").split(",")
+
+    invoices = Invoice.objects.none()
+    receipts = Receipt.objects.none()
+
+    if "invoices" in include:
+        invoices = Invoice.objects.select_related("customer").prefetch_related(
+            "items__product", "receipts"
+        )
+        if start:
+            invoices = invoices.filter(date__gte=start)
+        if end:
+            invoices = invoices.filter(date__lte=end)
+        if status:
+            invoices = invoices.filter(status=status)
+
+    if "receipts" in include:
+        receipts = Receipt.objects.select_related("invoice__customer")
+        if start:
+            receipts = receipts.filter(date__gte=start)
+        if end:
+            receipts = receipts.filter(date__lte=end)
+        if status:
+            receipts = receipts.filter(invoice__status=status)
+
+    return invoices.order_by("date", "id"), receipts.order_by("date", "id")
+
+
+def stream_zip(invoices, receipts):
+    """Yield the bytes of a ZIP archive holding one PDF per document."""
+    pages = chain(
+        (
+            (f"invoices/{invoice.number}.pdf", documents.invoice_html, invoice)
+            for invoice in invoices.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+        ),
+        (
+            (f"receipts/{receipt.number}.pdf", documents.receipt_html, receipt)
+            for receipt in receipts.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+        ),
+    )
+
+    stream = _ZipStream()
+    # PDFs are already compressed; deflating them again only costs CPU.
+    with zipfile.ZipFile(stream, mode="w", compression=zipfile.ZIP_STORED) as archive:
+        while batch := list(islice(pages, BATCH_SIZE)):
+            names = [name for name, _, _ in batch]
+            htmls = [to_html(document) for _, to_html, document in batch]
+            for index, path, error in pdf_jobs.render_many(htmls):
+                if error is None:
+                    try:
+                        with open(path, "rb") as f:
+                            pdf = f.read()
+                    except FileNotFoundError:
+                        # Evicted by someone else in the meantime; render it here.
+                        try:
+                            pdf = pdf_cache.render(htmls[index])
+                        except Exception as e:
+                            error = e
+                if error is None:
+                    archive.writestr(names[index], pdf)
+                else:
+                    # The response has already started, so a failed document
+                    # is listed in the archive instead of cutting it short.
+                    archive.writestr(
+                        names[index].removesuffix(".pdf") + ".error.txt",
+                        str(error) or error.__class__.__name__,
+                    )
+                yield stream.take()
+
+    pdf_cache.evict()
+    yield stream.take()
@@ -0,0 +1,215 @@
+"""
+Background PDF rendering.
+
+WeasyPrint runs in a small local process pool instead of the request
+thread. A job is identified by its sales.pdf_cache key and writes straight
+into the PDF cache, so any web process can tell a finished job by the file
+being there. The job's state lives next to it on disk too: a
+jobs/<key>.pending marker while it renders and jobs/<key>.failed (holding
+the error) if it fails, so any web process can also answer for a job that
+is still running or has failed, and submitting the same document twice,
+from any process, reuses the first job.
+
+At most settings.PDF_RENDER_WORKERS + settings.PDF_RENDER_QUEUE_LIMIT jobs
+are pending at once across all processes, which keeps memory use bounded
+no matter how many downloads come in. A pending marker older than
+settings.PDF_RENDER_JOB_TIMEOUT is a render that died with its process,
+and counts as failed.
+
+The pool belongs to the process that made it: it is created on first use,
+so a server that forks its workers after import gives each worker its own,
+and a pool whose worker died (BrokenProcessPool) is replaced and the job
+submitted once more.
+"""
+import os
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+from . import pdf_cache
+
+KEY_RE = re.compile(r"^[0-9a-f]{64}$")
+
+_lock = threading.Lock()
+_executor_lock = threading.Lock()
+_executor = None
+_executor_pid = None
+
+
+class QueueFull(Exception):
+    pass
+
+
+def wants_async(request):
+    return request.GET.get("async") == "1" or settings.PDF_RENDER_ASYNC
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    with _executor_lock:
+        # A pool inherited through fork is not usable in the child.
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ProcessPoolExecutor(max_workers=settings.PDF_RENDER_WORKERS)
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _reset_executor(broken):
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def _submit(html, key):
+    executor = _get_executor()
+    try:
+        return executor.submit(pdf_cache.render_to_file, html, str(pdf_cache.path_for(key)))
+    except BrokenProcessPool:
+        _reset_executor(executor)
+        return _get_executor().submit(pdf_cache.render_to_file, html, str(pdf_cache.path_for(key)))
+
+
+def jobs_dir():
+    return pdf_cache.cache_dir() / "jobs"
+
+
+def _marker(key, state):
+    return jobs_dir() / f"{key}.{state}"
+
+
+def _age(path):
+    """Seconds since `path` was written, or None when it does not exist."""
+    try:
+        return time.time() - path.stat().st_mtime
+    except FileNotFoundError:
+        return None
+
+
+def _running(path):
+    age = _age(path)
+    return age is not None and age < settings.PDF_RENDER_JOB_TIMEOUT
+
+
+def _markers(state):
+    try:
+        return [jobs_dir() / name for name in os.listdir(jobs_dir()) if name.endswith(f".{state}")]
+    except FileNotFoundError:
+        return []
+
+
+def _claim(key):
+    """Create the pending marker; False when a live job already holds it."""
+    path = _marker(key, "pending")
+    try:
+        os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        if _running(path):
+            return False
+        path.touch()  # left behind by a render that died; take it over
+    return True
+
+
+def _done(key, future):
+    error = future.exception()
+    if error is not None:
+        pdf_cache.write(_marker(key, "failed"), (str(error) or error.__class__.__name__).encode())
+        # Only the latest failures are worth remembering.
+        failed = sorted(_markers("failed"), key=lambda path: _age(path) or 0)
+        for path in failed[settings.PDF_RENDER_QUEUE_LIMIT:]:
+            path.unlink(missing_ok=True)
+    _marker(key, "pending").unlink(missing_ok=True)
+    if error is None:
+        try:
+            pdf_cache.written(pdf_cache.path_for(key).stat().st_size)
+        except FileNotFoundError:
+            pass
+
+
+def submit(html):
+    """Queue `html` for rendering (unless already cached) and return the job key."""
+    key = pdf_cache.cache_key(html)
+    if pdf_cache.get(key) is not None:
+        return key
+
+    jobs_dir().mkdir(parents=True, exist_ok=True)
+    with _lock:
+        if _running(_marker(key, "pending")):
+            return key
+        pending = sum(_running(path) for path in _markers("pending"))
+        if pending >= settings.PDF_RENDER_WORKERS + settings.PDF_RENDER_QUEUE_LIMIT:
+            raise QueueFull()
+        if not _claim(key):
+            return key
+
+        _marker(key, "failed").unlink(missing_ok=True)
+        future = _submit(html, key)
+
+    future.add_done_callback(lambda f: _done(key, f))
+    return key
+
+
+def status(key):
+    """One of "ready", "pending", "failed" or "unknown"."""
+    if not KEY_RE.match(key):
+        return "unknown"
+    if pdf_cache.get(key) is not None:
+        return "ready"
+    pending = _age(_marker(key, "pending"))
+    if pending is not None and pending < settings.PDF_RENDER_JOB_TIMEOUT:
+        return "pending"
+    if pending is not None or _age(_marker(key, "failed")) is not None:
+        return "failed"
+    return "unknown"
+
+
+def error(key):
+    try:
+        return _marker(key, "failed").read_text(encoding="utf-8")
+    except FileNotFoundError:
+        if _age(_marker(key, "pending")) is not None:
+            return f"The render did not finish within {settings.PDF_RENDER_JOB_TIMEOUT} s."
+        return None
+
+
+def render_many(htmls, window=None):
+    """
+    Render many documents on the pool and yield (index, path, error) for each
+    one as soon as its PDF is on disk; cached documents come back straight
+    away. A document that fails to render comes back with path None and the
+    exception as error, and the others carry on.
+
+    Only `window` renders are queued at a time, so a huge export neither
+    floods the pool nor holds every PDF in memory. These renders bypass the
+    interactive queue limit and do not evict until the caller is done.
+    """
+    window = window or settings.PDF_RENDER_WORKERS * 2
+    in_flight = {}
+
+    def finished(futures):
+        for future in futures:
+            index = in_flight.pop(future)
+            error = future.exception()
+            yield index, None if error else future.result(), error
+
+    for index, html in enumerate(htmls):
+        key = pdf_cache.cache_key(html)
+        path = pdf_cache.get(key)
+        if path is not None:
+            yield index, str(path), None
+            continue
+
+        future = _submit(html, key)
+        in_flight[future] = index
+        if len(in_flight) >= window:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            yield from finished(done)
+
+    while in_flight:
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        yield from finished(done)
@@ -0,0 +1,92 @@
+"""
+Receiving purchase orders into stock.
+
+receive() takes any number of purchase orders in one transaction: it locks
+the still-Pending ones, flips them to Received with a conditional UPDATE
+(WHERE status = 'Pending'), then adds the ordered quantities to stock with
+one F()-based UPDATE over all products involved, duplicate lines summed
+first, and writes the matching PO receipt rows to the stock ledger. A purchase order can therefore only ever be received once, and two
+clerks receiving at the same time cannot lose each other's increments.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+
+from inventory import ledger
+from inventory.models import Product, StockMovement
+
+from . import kpis, rollups
+from .models import PurchaseOrder, PurchaseOrderItem
+
+
+class ReceiveConflict(Exception):
+    """Another request received some of the purchase orders first."""
+
+
+def received_lines(po_ids):
+    """(product_id, quantity, "PO #id") per purchase order and product, duplicate lines summed."""
+    rows = (
+        PurchaseOrderItem.objects.filter(purchase_order_id__in=po_ids)
+        .values("purchase_order_id", "product_id")
+        .annotate(quantity=Sum("quantity"))
+        .order_by()
+    )
+    return [
+        (row["product_id"], row["quantity"], f"PO #{row['purchase_order_id']}")
+        for row in rows
+        if row["quantity"]
+    ]
+
+
+def stock_increments(lines):
+    """{product_id: quantity} over received_lines()."""
+    increments = defaultdict(int)
+    for product_id, quantity, _ in lines:
+        increments[product_id] += quantity
+    return increments
+
+
+def add_stock(increments):
+    """Add {product_id: quantity} to Product.stock in a single UPDATE."""
+    if not increments:
+        return 0
+    return Product.objects.filter(pk__in=increments).update(
+        stock=F("stock") + Case(
+            *[When(pk=pk, then=Value(quantity)) for pk, quantity in increments.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    )
+
+
+def receive(po_ids):
+    """
+    Receive the Pending purchase orders among `po_ids` and return them.
+    Ones already received are skipped.
+    """
+    with transaction.atomic():
+        orders = list(
+            PurchaseOrder.objects.select_for_update()
+            .filter(pk__in=po_ids, status="Pending")
+            .only("id", "date", "status", "total_amount")
+        )
+        if not orders:
+            return []
+
+        ids = [po.pk for po in orders]
+        claimed = PurchaseOrder.objects.filter(pk__in=ids, status="Pending").update(status="Received")
+        if claimed != len(ids):
+            raise ReceiveConflict("Purchase order was received by someone else.")
+
+        lines = received_lines(ids)
+        add_stock(stock_increments(lines))
+        ledger.record_many(StockMovement.RECEIPT, lines)
+
+        # queryset.update() skips the model signals, so do their work here.
+        for po in orders:
+            po.status = "Received"
+            rollups.apply(rollups.purchase_order_contribution(po))
+        transaction.on_commit(kpis.invalidate)
+
+    return orders
@@ -0,0 +1,82 @@
+"""
+Per-day and per-month sales/purchase totals for the dashboard.
+
+Receipts count towards sales on their date, purchase orders count towards
+purchases on their date once they are Received. The rollup rows are moved
+by deltas from sales.signals; rebuild() recomputes them from scratch.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from .models import DailySalesRollup, MonthlySalesRollup, PurchaseOrder, Receipt
+
+
+def receipt_contribution(receipt):
+    return receipt.date, {"sales_total": receipt.amount_paid, "receipt_count": 1}
+
+
+def purchase_order_contribution(po):
+    if po.status != "Received":
+        return None
+    return po.date, {"purchases_total": po.total_amount, "purchase_order_count": 1}
+
+
+def apply(contribution, sign=1):
+    """Add (sign=1) or remove (sign=-1) a contribution from its day and month."""
+    if contribution is None:
+        return
+    day, values = contribution
+    changes = {
+        field: F(field) + sign * (Decimal(value) if field.endswith("_total") else value)
+        for field, value in values.items()
+    }
+
+    with transaction.atomic():
+        for model, key in (
+            (DailySalesRollup, {"day": day}),
+            (MonthlySalesRollup, {"month": day.replace(day=1)}),
+        ):
+            model.objects.get_or_create(**key)
+            model.objects.filter(**key).update(**changes)
+
+
+def rebuild():
+    """Throw away all rollup rows and recompute them from receipts and POs."""
+    days = defaultdict(lambda: {
+        "sales_total": Decimal("0"),
+        "receipt_count": 0,
+        "purchases_total": Decimal("0"),
+        "purchase_order_count": 0,
+    })
+
+    for row in Receipt.objects.values("date").annotate(
+        total=Sum("amount_paid"), count=Count("id")
+    ):
+        days[row["date"]]["sales_total"] += row["total"] or 0
+        days[row["date"]]["receipt_count"] += row["count"]
+
+    for row in PurchaseOrder.objects.filter(status="Received").values("date").annotate(
+        total=Sum("total_amount"), count=Count("id")
+    ):
+        days[row["date"]]["purchases_total"] += row["total"] or 0
+        days[row["date"]]["purchase_order_count"] += row["count"]
+
+    months = defaultdict(lambda: defaultdict(int))
+    for day, values in days.items():
+        for field, value in values.items():
+            months[day.replace(day=1)][field] += value
+
+    with transaction.atomic():
+        DailySalesRollup.objects.all().delete()
+        MonthlySalesRollup.objects.all().delete()
+        DailySalesRollup.objects.bulk_create(
+            DailySalesRollup(day=day, **values) for day, values in days.items()
+        )
+        MonthlySalesRollup.objects.bulk_create(
+            MonthlySalesRollup(month=month, **values) for month, values in months.items()
+        )
+
+    return len(days), len(months)
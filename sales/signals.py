@@ -0,0 +1,146 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from crm.models import Customer
+
+from . import kpis, payments, rollups, stock, totals
+from .models import CustomerOrder, Invoice, PurchaseOrder, Quotation, Receipt
+
+
+# --------------------------------------------------------
+# DASHBOARD ROLLUPS
+# --------------------------------------------------------
+CONTRIBUTIONS = {
+    Receipt: rollups.receipt_contribution,
+    PurchaseOrder: rollups.purchase_order_contribution,
+}
+
+
+@receiver(pre_save, sender=Receipt)
+@receiver(pre_save, sender=PurchaseOrder)
+def remember_previous_row(sender, instance, update_fields=None, **kwargs):
+    # The row as it was before this save, so post_save can move totals.
+    instance._previous_row = (
+        sender.objects.filter(pk=instance.pk).first() if instance.pk else None
+    )
+    if sender is PurchaseOrder and instance._previous_row and "total_amount" not in (update_fields or ()):
+        # Not written by this save (sales.totals owns it): count the stored total.
+        instance.total_amount = instance._previous_row.total_amount
+
+
+@receiver(post_save, sender=Receipt)
+@receiver(post_save, sender=PurchaseOrder)
+def update_rollups_on_save(sender, instance, **kwargs):
+    previous_row = getattr(instance, "_previous_row", None)
+    previous = CONTRIBUTIONS[sender](previous_row) if previous_row else None
+    current = CONTRIBUTIONS[sender](instance)
+    if previous != current:
+        rollups.apply(previous, sign=-1)
+        rollups.apply(current)
+
+
+@receiver(post_delete, sender=Receipt)
+@receiver(post_delete, sender=PurchaseOrder)
+def update_rollups_on_delete(sender, instance, **kwargs):
+    rollups.apply(CONTRIBUTIONS[sender](instance), sign=-1)
+
+
+# --------------------------------------------------------
+# INVOICE PAYMENTS (amount_received / balance_due / status)
+# --------------------------------------------------------
+@receiver(post_save, sender=Receipt)
+def update_invoice_payments_on_save(sender, instance, **kwargs):
+    previous = getattr(instance, "_previous_row", None)
+    amount = Decimal(str(instance.amount_paid))
+
+    with transaction.atomic():
+        if previous is None:
+            payments.add_payment(instance.invoice_id, amount)
+        elif previous.invoice_id != instance.invoice_id:
+            payments.add_payment(previous.invoice_id, -previous.amount_paid)
+            payments.add_payment(instance.invoice_id, amount)
+        else:
+            payments.add_payment(instance.invoice_id, amount - previous.amount_paid)
+
+    instance._previous_row = None
+
+
+@receiver(post_delete, sender=Receipt)
+def update_invoice_payments_on_delete(sender, instance, **kwargs):
+    payments.add_payment(instance.invoice_id, -Decimal(str(instance.amount_paid)))
+
+
+# --------------------------------------------------------
+# DOCUMENT TOTALS (PurchaseOrder / Quotation / Invoice)
+# --------------------------------------------------------
+def remember_previous_line(sender, instance, **kwargs):
+    previous = sender.objects.filter(pk=instance.pk).first() if instance.pk else None
+    instance._previous_line = totals.line_key(previous) if previous else None
+
+
+def update_total_on_item_save(sender, instance, **kwargs):
+    totals.move_line(sender, getattr(instance, "_previous_line", None), totals.line_key(instance))
+    instance._previous_line = None
+
+
+# (document model, pk) of the documents being deleted right now. Their
+# lines go first in the same delete and have no total left to fix; moving
+# it would also take a received PO out of the purchase rollups twice.
+_deleting_documents = set()
+
+
+def mark_document_deleting(sender, instance, **kwargs):
+    _deleting_documents.add((sender, instance.pk))
+
+
+def unmark_document_deleting(sender, instance, **kwargs):
+    _deleting_documents.discard((sender, instance.pk))
+
+
+def update_total_on_item_delete(sender, instance, **kwargs):
+    document_model, fk, _ = totals.ITEMS[sender]
+    if (document_model, getattr(instance, f"{fk}_id")) in _deleting_documents:
+        return
+    totals.move_line(sender, totals.line_key(instance), None)
+
+
+for model in totals.ITEMS:
+    pre_save.connect(remember_previous_line, sender=model, dispatch_uid=f"totals_pre_save_{model.__name__}")
+    post_save.connect(update_total_on_item_save, sender=model, dispatch_uid=f"totals_save_{model.__name__}")
+    post_delete.connect(update_total_on_item_delete, sender=model, dispatch_uid=f"totals_delete_{model.__name__}")
+
+for model, _, _ in totals.ITEMS.values():
+    pre_delete.connect(mark_document_deleting, sender=model, dispatch_uid=f"totals_pre_delete_{model.__name__}")
+    post_delete.connect(unmark_document_deleting, sender=model, dispatch_uid=f"totals_delete_{model.__name__}")
+
+
+# --------------------------------------------------------
+# STOCK (sold lines go back when their document is deleted)
+# --------------------------------------------------------
+@receiver(pre_delete, sender=Invoice)
+@receiver(pre_delete, sender=CustomerOrder)
+def restock_deleted_document(sender, instance, **kwargs):
+    if sender is Invoice:
+        reference, note = instance.number, "Invoice deleted"
+    else:
+        reference, note = f"Order #{instance.pk}", "Order deleted"
+    stock.restock(stock.quantities(instance.items.all()), reference=reference, note=note)
+
+
+# --------------------------------------------------------
+# KPI CACHE
+# --------------------------------------------------------
+KPI_MODELS = [Invoice, Quotation, Receipt, PurchaseOrder, Customer]
+
+
+def invalidate_kpis(sender, **kwargs):
+    # After commit, so nobody re-caches the old numbers under the new version.
+    transaction.on_commit(kpis.invalidate)
+
+
+for model in KPI_MODELS:
+    post_save.connect(invalidate_kpis, sender=model, dispatch_uid=f"kpis_save_{model.__name__}")
+    post_delete.connect(invalidate_kpis, sender=model, dispatch_uid=f"kpis_delete_{model.__name__}")
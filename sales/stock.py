@@ -0,0 +1,140 @@
+"""
+Taking sold quantities out of stock.
+
+deduct() removes every line of a document from Product.stock with one
+UPDATE whose WHERE clause only matches products that still have enough
+(stock >= quantity), or one per CHUNK_SIZE products on a very large
+document. If fewer rows change than there are products, another till got
+there first: InsufficientStock is raised and the caller's transaction,
+document included, rolls back. Sale movements go to the stock ledger in
+the same transaction.
+
+restock() is the reverse, for sold lines that are deleted or lowered: it
+adds the quantities back with the same kind of UPDATE and records positive
+sale movements against the same reference, so the ledger nets out.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from inventory import ledger
+from inventory.models import Product, StockMovement
+
+
+class InsufficientStock(Exception):
+    def __init__(self, shortages):
+        self.shortages = shortages  # [(product, wanted, in stock)]
+        super().__init__(", ".join(
+            f"{product}: {wanted} wanted, {available} in stock"
+            for product, wanted, available in shortages
+        ))
+
+
+class _Short(Exception):
+    pass
+
+
+# Products per UPDATE; keeps the CASE and its parameters within SQLite's limits.
+CHUNK_SIZE = 500
+
+
+def _chunks(quantities):
+    items = list(quantities.items())
+    for start in range(0, len(items), CHUNK_SIZE):
+        yield dict(items[start:start + CHUNK_SIZE])
+
+
+def _per_product(quantities):
+    """CASE pk WHEN ... THEN quantity: each product's own quantity in one flat expression."""
+    return Case(
+        *[When(pk=pk, then=Value(quantity)) for pk, quantity in quantities.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def quantities(items):
+    """{product_id: quantity} over item rows, duplicate products summed."""
+    wanted = defaultdict(int)
+    for product_id, quantity in items.values_list("product_id", "quantity"):
+        if product_id is not None and quantity:
+            wanted[product_id] += quantity
+    return wanted
+
+
+def deduct(wanted, reference="", movements=None):
+    """
+    Take {product_id: quantity} out of stock, all or nothing. The ledger
+    gets one sale per product under `reference`, or the given `movements`
+    ((product_id, -quantity, reference) rows, e.g. per document of a batch).
+    """
+    if not wanted:
+        return
+
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                for chunk in _chunks(wanted):
+                    updated = (
+                        Product.objects.filter(pk__in=chunk, stock__gte=_per_product(chunk))
+                        .update(stock=F("stock") - _per_product(chunk))
+                    )
+                    if updated != len(chunk):
+                        raise _Short()
+        except _Short:
+            # The savepoint is rolled back, so this reads the stock as it was.
+            raise InsufficientStock(_shortages(wanted)) from None
+
+        if movements is None:
+            movements = [(pk, -quantity, reference) for pk, quantity in wanted.items()]
+        ledger.record_many(StockMovement.SALE, movements)
+
+
+def _shortages(wanted):
+    products = Product.objects.in_bulk(list(wanted))
+    shortages = []
+    for pk, quantity in wanted.items():
+        product = products.get(pk)
+        available = product.stock if product else 0
+        if available < quantity:
+            shortages.append((product or f"Product #{pk}", quantity, available))
+    return shortages
+
+
+def sell_invoice(invoice):
+    deduct(quantities(invoice.items.all()), reference=invoice.number)
+
+
+def restock(returned, reference="", movements=None, note=""):
+    """
+    Put {product_id: quantity} back into stock. `movements` as for deduct(),
+    with positive quantities.
+    """
+    if not returned:
+        return
+
+    with transaction.atomic():
+        for chunk in _chunks(returned):
+            Product.objects.filter(pk__in=chunk).update(stock=F("stock") + _per_product(chunk))
+
+        if movements is None:
+            movements = [(pk, quantity, reference) for pk, quantity in returned.items()]
+        ledger.record_many(StockMovement.SALE, movements, note=note)
+
+
+def sell_changes(before, after, reference=""):
+    """
+    Move stock by the difference between a document's lines before and
+    after an edit ({product_id: quantity} each): added or raised quantities
+    come out of stock, all or nothing, removed or lowered ones go back.
+    """
+    products = set(before) | set(after)
+    change = {pk: after.get(pk, 0) - before.get(pk, 0) for pk in products}
+
+    with transaction.atomic():
+        deduct({pk: delta for pk, delta in change.items() if delta > 0}, reference=reference)
+        restock(
+            {pk: -delta for pk, delta in change.items() if delta < 0},
+            reference=reference, note="Line removed or lowered",
+        )
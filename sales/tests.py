@@ -0,0 +1,367 @@
+from datetime import date
+from decimal import Decimal
+
+from django.test import TestCase
+
+from crm.models import Customer, Supplier
+from inventory.models import Product, StockMovement
+
+from . import conversion, payments, receiving, rollups, stock, totals
+from .models import (
+    CustomerOrder, CustomerOrderItem,
+    DailySalesRollup, MonthlySalesRollup,
+    Invoice, InvoiceItem,
+    PurchaseOrder, PurchaseOrderItem,
+    Quotation, QuotationItem,
+    Receipt,
+)
+
+
+def make_product(stock=10, **fields):
+    return Product.objects.create(
+        animal_type="Cow", meat_type="Beef", weight_kg=1,
+        cost_price_per_kg=1, selling_price_per_kg=2, stock=stock, **fields,
+    )
+
+
+def refreshed(obj):
+    obj.refresh_from_db()
+    return obj
+
+
+class DocumentTotalTests(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(name="Customer")
+        self.supplier = Supplier.objects.create(name="Supplier")
+        self.product = make_product()
+
+    def test_quotation_lines_move_the_total(self):
+        quotation = Quotation.objects.create(customer=self.customer)
+        line = QuotationItem.objects.create(quotation=quotation, quantity=3, price=Decimal("2.50"))
+        QuotationItem.objects.create(quotation=quotation, quantity=1, price=Decimal("4"))
+        self.assertEqual(refreshed(quotation).total_amount, Decimal("11.50"))
+
+        line.quantity = 1
+        line.save()
+        self.assertEqual(refreshed(quotation).total_amount, Decimal("6.50"))
+
+        line.delete()
+        self.assertEqual(refreshed(quotation).total_amount, Decimal("4.00"))
+
+    def test_moving_a_line_to_another_document(self):
+        first = Quotation.objects.create(customer=self.customer)
+        second = Quotation.objects.create(customer=self.customer)
+        line = QuotationItem.objects.create(quotation=first, quantity=2, price=5)
+
+        line.quotation = second
+        line.save()
+
+        self.assertEqual(refreshed(first).total_amount, 0)
+        self.assertEqual(refreshed(second).total_amount, 10)
+
+    def test_invoice_lines_move_the_balance(self):
+        invoice = Invoice.objects.create(customer=self.customer)
+        line = InvoiceItem.objects.create(invoice=invoice, quantity=2, price=10)
+        invoice = refreshed(invoice)
+        self.assertEqual((invoice.total_amount, invoice.balance_due), (20, 20))
+
+        line.delete()
+        invoice = refreshed(invoice)
+        self.assertEqual((invoice.total_amount, invoice.balance_due), (0, 0))
+
+    def test_saving_a_stale_document_keeps_the_total(self):
+        invoice = Invoice.objects.create(customer=self.customer)
+        stale = Invoice.objects.get(pk=invoice.pk)
+        InvoiceItem.objects.create(invoice=invoice, quantity=2, price=5)
+
+        stale.status = "Cancelled"
+        stale.save()
+
+        invoice = refreshed(invoice)
+        self.assertEqual((invoice.status, invoice.total_amount), ("Cancelled", 10))
+
+    def test_receiving_a_stale_purchase_order_counts_its_stored_total(self):
+        po = PurchaseOrder.objects.create(supplier=self.supplier)
+        stale = PurchaseOrder.objects.get(pk=po.pk)
+        PurchaseOrderItem.objects.create(purchase_order=po, product=self.product, quantity=4, cost_price=5)
+
+        stale.status = "Received"
+        stale.save()
+
+        self.assertEqual(refreshed(po).total_amount, 20)
+        self.assertEqual(MonthlySalesRollup.objects.get().purchases_total, 20)
+
+    def test_cascade_delete_does_not_move_totals_twice(self):
+        po = PurchaseOrder.objects.create(supplier=self.supplier)
+        PurchaseOrderItem.objects.create(purchase_order=po, product=self.product, quantity=5, cost_price=5)
+        po = refreshed(po)
+        po.status = "Received"
+        po.save()
+
+        self.supplier.delete()
+
+        self.assertEqual(MonthlySalesRollup.objects.get().purchases_total, 0)
+        self.assertEqual(DailySalesRollup.objects.get().purchases_total, 0)
+
+    def test_recalculate_matches_the_lines(self):
+        quotation = Quotation.objects.create(customer=self.customer)
+        QuotationItem.objects.create(quotation=quotation, quantity=3, price=2)
+        Quotation.objects.filter(pk=quotation.pk).update(total_amount=99)
+
+        totals.recalculate(Quotation, [quotation.pk])
+
+        self.assertEqual(refreshed(quotation).total_amount, 6)
+
+
+class PaymentTests(TestCase):
+    def setUp(self):
+        customer = Customer.objects.create(name="Customer")
+        self.invoice = Invoice.objects.create(customer=customer)
+        InvoiceItem.objects.create(invoice=self.invoice, quantity=1, price=100)
+
+    def payment_state(self, invoice=None):
+        invoice = refreshed(invoice or self.invoice)
+        return invoice.amount_received, invoice.balance_due, invoice.status
+
+    def test_receipts_move_received_balance_and_status(self):
+        first = Receipt.objects.create(invoice=self.invoice, amount_paid=30)
+        self.assertEqual(self.payment_state(), (30, 70, "Partially Paid"))
+
+        Receipt.objects.create(invoice=self.invoice, amount_paid=70)
+        self.assertEqual(self.payment_state(), (100, 0, "Paid"))
+
+        first.amount_paid = 10
+        first.save()
+        self.assertEqual(self.payment_state(), (80, 20, "Partially Paid"))
+
+        Receipt.objects.all().delete()
+        self.assertEqual(self.payment_state(), (0, 100, "Unpaid"))
+
+    def test_moving_a_receipt_to_another_invoice(self):
+        other = Invoice.objects.create(customer=self.invoice.customer)
+        InvoiceItem.objects.create(invoice=other, quantity=1, price=50)
+        receipt = Receipt.objects.create(invoice=self.invoice, amount_paid=50)
+
+        receipt.invoice = other
+        receipt.save()
+
+        self.assertEqual(self.payment_state(), (0, 100, "Unpaid"))
+        self.assertEqual(self.payment_state(other), (50, 0, "Paid"))
+
+    def test_cancelled_invoices_keep_their_status(self):
+        self.invoice.status = "Cancelled"
+        self.invoice.save()
+
+        Receipt.objects.create(invoice=self.invoice, amount_paid=100)
+
+        self.assertEqual(self.payment_state(), (100, 0, "Cancelled"))
+
+    def test_reconcile_fixes_drifted_invoices(self):
+        Receipt.objects.create(invoice=self.invoice, amount_paid=40)
+        Invoice.objects.filter(pk=self.invoice.pk).update(amount_received=7, balance_due=93)
+        self.assertEqual(list(payments.drifted_invoices()), [self.invoice])
+
+        payments.reconcile()
+
+        self.assertEqual(self.payment_state(), (40, 60, "Partially Paid"))
+        self.assertFalse(payments.drifted_invoices().exists())
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        customer = Customer.objects.create(name="Customer")
+        self.invoice = Invoice.objects.create(customer=customer, total_amount=1000)
+        self.supplier = Supplier.objects.create(name="Supplier")
+        self.today = date.today()
+
+    def rollups(self):
+        fields = ("sales_total", "receipt_count", "purchases_total", "purchase_order_count")
+        return (
+            list(DailySalesRollup.objects.values_list("day", *fields)),
+            list(MonthlySalesRollup.objects.values_list("month", *fields)),
+        )
+
+    def assertRollups(self, sales_total, receipt_count, purchases_total=0, purchase_order_count=0):
+        values = (sales_total, receipt_count, purchases_total, purchase_order_count)
+        self.assertEqual(self.rollups(), (
+            [(self.today, *values)],
+            [(self.today.replace(day=1), *values)],
+        ))
+
+    def test_receipts_move_the_day_and_month(self):
+        receipt = Receipt.objects.create(invoice=self.invoice, amount_paid=30)
+        Receipt.objects.create(invoice=self.invoice, amount_paid=20)
+        self.assertRollups(50, 2)
+
+        receipt.amount_paid = 10
+        receipt.save()
+        self.assertRollups(30, 2)
+
+        receipt.delete()
+        self.assertRollups(20, 1)
+
+    def test_purchase_orders_count_once_received(self):
+        po = PurchaseOrder.objects.create(supplier=self.supplier, total_amount=40)
+        self.assertEqual(self.rollups(), ([], []))
+
+        po.status = "Received"
+        po.save()
+        self.assertRollups(0, 0, 40, 1)
+
+        po.delete()
+        self.assertRollups(0, 0, 0, 0)
+
+    def test_rebuild_matches_the_deltas(self):
+        Receipt.objects.create(invoice=self.invoice, amount_paid=30)
+        PurchaseOrder.objects.create(supplier=self.supplier, total_amount=40, status="Received")
+        incremental = self.rollups()
+
+        rollups.rebuild()
+
+        self.assertEqual(self.rollups(), incremental)
+
+
+class ReceivingTests(TestCase):
+    def setUp(self):
+        self.supplier = Supplier.objects.create(name="Supplier")
+
+    def purchase_order(self, *lines):
+        po = PurchaseOrder.objects.create(supplier=self.supplier)
+        for product, quantity in lines:
+            PurchaseOrderItem.objects.create(purchase_order=po, product=product, quantity=quantity, cost_price=2)
+        return po
+
+    def test_receiving_adds_stock_once(self):
+        beef, goat = make_product(stock=1), make_product(stock=0)
+        first = self.purchase_order((beef, 2), (beef, 3), (goat, 4))
+        second = self.purchase_order((beef, 1))
+
+        received = receiving.receive([first.pk, second.pk])
+        again = receiving.receive([first.pk])
+
+        self.assertEqual(sorted(po.pk for po in received), [first.pk, second.pk])
+        self.assertEqual(again, [])
+        self.assertEqual(refreshed(beef).stock, 7)
+        self.assertEqual(refreshed(goat).stock, 4)
+        self.assertEqual(
+            sorted(StockMovement.objects.filter(kind=StockMovement.RECEIPT).values_list("product_id", "quantity", "reference")),
+            sorted([(beef.pk, 5, f"PO #{first.pk}"), (goat.pk, 4, f"PO #{first.pk}"), (beef.pk, 1, f"PO #{second.pk}")]),
+        )
+        self.assertEqual(MonthlySalesRollup.objects.get().purchases_total, 20)
+        self.assertEqual(MonthlySalesRollup.objects.get().purchase_order_count, 2)
+
+
+class ConversionTests(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(name="Customer")
+
+    def quotation(self, lines, status="Accepted"):
+        quotation = Quotation.objects.create(customer=self.customer, status=status)
+        QuotationItem.objects.bulk_create([
+            QuotationItem(quotation=quotation, product=product, quantity=quantity, price=price)
+            for product, quantity, price in lines
+        ])
+        return quotation
+
+    def test_batch_over_a_thousand_products(self):
+        Product.objects.bulk_create([
+            Product(animal_type="Cow", meat_type="Beef", weight_kg=1,
+                    cost_price_per_kg=1, selling_price_per_kg=2, stock=5)
+            for _ in range(1200)
+        ])
+        products = list(Product.objects.order_by("pk"))
+        first = self.quotation([(product, 2, 1) for product in products[:700]])
+        second = self.quotation([(product, 1, 1) for product in products[500:]])
+
+        created, existing = conversion.convert_many([first, second])
+
+        self.assertEqual(len(created), 2)
+        self.assertEqual(existing, [])
+        self.assertEqual(InvoiceItem.objects.count(), 1400)
+        stocks = dict(Product.objects.values_list("pk", "stock"))
+        self.assertEqual(stocks[products[0].pk], 3)
+        self.assertEqual(stocks[products[600].pk], 2)
+        self.assertEqual(stocks[products[1100].pk], 4)
+
+    def test_reconverting_returns_the_existing_invoice(self):
+        product = make_product(stock=10)
+        quotation = self.quotation([(product, 3, Decimal("2.50"))])
+
+        invoice, created = conversion.convert(quotation)
+        again, created_again = conversion.convert(quotation)
+
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertEqual(again.pk, invoice.pk)
+        self.assertEqual(Invoice.objects.count(), 1)
+        invoice.refresh_from_db()
+        self.assertEqual(invoice.total_amount, Decimal("7.50"))
+        self.assertEqual(invoice.balance_due, Decimal("7.50"))
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 7)
+
+    def test_shortage_converts_nothing(self):
+        plenty, scarce = make_product(stock=10), make_product(stock=1)
+        first = self.quotation([(plenty, 2, 1)])
+        second = self.quotation([(scarce, 2, 1)])
+
+        with self.assertRaises(stock.InsufficientStock):
+            conversion.convert_many([first, second])
+
+        self.assertFalse(Invoice.objects.exists())
+        plenty.refresh_from_db()
+        self.assertEqual(plenty.stock, 10)
+
+
+class StockTests(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(name="Customer")
+
+    def movements(self, product):
+        return list(
+            StockMovement.objects.filter(product=product, kind=StockMovement.SALE)
+            .order_by("id").values_list("quantity", "reference")
+        )
+
+    def test_deduct_is_all_or_nothing(self):
+        plenty, scarce = make_product(stock=10), make_product(stock=1)
+
+        with self.assertRaises(stock.InsufficientStock) as raised:
+            stock.deduct({plenty.pk: 2, scarce.pk: 3}, reference="INV-X")
+
+        self.assertEqual([(s[1], s[2]) for s in raised.exception.shortages], [(3, 1)])
+        plenty.refresh_from_db()
+        self.assertEqual(plenty.stock, 10)
+        self.assertEqual(self.movements(plenty), [])
+
+    def test_sell_changes_deducts_and_restocks_the_difference(self):
+        kept, dropped, added = make_product(stock=10), make_product(stock=10), make_product(stock=10)
+
+        stock.sell_changes({kept.pk: 2, dropped.pk: 3}, {kept.pk: 5, added.pk: 1}, reference="Order #1")
+
+        stocks = dict(Product.objects.values_list("pk", "stock"))
+        self.assertEqual(stocks, {kept.pk: 7, dropped.pk: 13, added.pk: 9})
+        self.assertEqual(self.movements(dropped), [(3, "Order #1")])
+
+    def test_deleting_an_invoice_restocks_its_lines(self):
+        product = make_product(stock=10)
+        quotation = Quotation.objects.create(customer=self.customer, status="Accepted")
+        QuotationItem.objects.create(quotation=quotation, product=product, quantity=4, price=1)
+        invoice, _ = conversion.convert(quotation)
+
+        invoice.delete()
+
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 10)
+        self.assertEqual(self.movements(product), [(-4, invoice.number), (4, invoice.number)])
+
+    def test_deleting_a_customer_order_restocks_its_lines(self):
+        product = make_product(stock=10)
+        order = CustomerOrder.objects.create(customer=self.customer)
+        CustomerOrderItem.objects.create(order=order, product=product, quantity=3, price=1)
+        stock.deduct({product.pk: 3}, reference=f"Order #{order.pk}")
+
+        self.customer.delete()
+
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 10)
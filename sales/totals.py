@@ -0,0 +1,112 @@
+"""
+PurchaseOrder, Quotation and Invoice total_amount maintenance.
+
+Item writes move their document's total by the line's delta with one
+UPDATE ... SET total_amount = total_amount + delta, inside the same
+transaction as the item write (see sales.signals). Nothing reloads the
+other lines, so an edit costs the same on a 3-line and a 300-line
+document. recalculate() is the set-based fallback: one UPDATE with a
+Sum(quantity * price) subquery per document.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from . import kpis, payments, rollups
+from .models import (
+    Invoice, InvoiceItem,
+    PurchaseOrder, PurchaseOrderItem,
+    Quotation, QuotationItem,
+)
+
+# item model -> (document model, foreign key field, unit price field)
+ITEMS = {
+    PurchaseOrderItem: (PurchaseOrder, "purchase_order", "cost_price"),
+    QuotationItem: (Quotation, "quotation", "price"),
+    InvoiceItem: (Invoice, "invoice", "price"),
+}
+
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+
+
+def line_total(item):
+    """quantity * price of an item, also for values still in POST string form."""
+    _, _, price_field = ITEMS[type(item)]
+    return int(item.quantity) * Decimal(str(getattr(item, price_field)))
+
+
+def line_key(item):
+    """(document id, line total) of an item, what an edit moves totals by."""
+    _, fk, _ = ITEMS[type(item)]
+    return getattr(item, f"{fk}_id"), line_total(item)
+
+
+def add(document_model, pk, amount):
+    """Move a document's total_amount by `amount`."""
+    if pk is None or not amount:
+        return
+
+    with transaction.atomic():
+        document_model.objects.filter(pk=pk).update(total_amount=F("total_amount") + amount)
+        _after_total_change(document_model, pk, amount)
+
+
+def move_line(item_model, previous, current):
+    """Apply an item edit given its (document id, line total) before and after."""
+    document_model = ITEMS[item_model][0]
+    if previous == current:
+        return
+
+    with transaction.atomic():
+        if previous and current and previous[0] == current[0]:
+            add(document_model, current[0], current[1] - previous[1])
+            return
+        if previous:
+            add(document_model, previous[0], -previous[1])
+        if current:
+            add(document_model, current[0], current[1])
+
+
+def total_subquery(item_model):
+    document_model, fk, price_field = ITEMS[item_model]
+    lines = (
+        item_model.objects.filter(**{fk: OuterRef("pk")})
+        .values(fk)
+        .annotate(total=Sum(ExpressionWrapper(F("quantity") * F(price_field), output_field=MONEY)))
+        .values("total")
+    )
+    return Coalesce(Subquery(lines, output_field=MONEY), Value(0), output_field=MONEY)
+
+
+def recalculate(document_model, pks=None):
+    """Recompute total_amount from the items of the given documents (all when None)."""
+    item_model = next(item for item, (doc, _, _) in ITEMS.items() if doc is document_model)
+    documents = document_model.objects.all()
+    if pks is not None:
+        documents = documents.filter(pk__in=pks)
+
+    with transaction.atomic():
+        updated = documents.update(total_amount=total_subquery(item_model))
+        if document_model is Invoice:
+            documents.update(**payments.payment_update(F("amount_received")))
+        elif document_model is PurchaseOrder:
+            transaction.on_commit(rollups.rebuild)
+        transaction.on_commit(kpis.invalidate)
+    return updated
+
+
+def _after_total_change(document_model, pk, amount):
+    # queryset.update() skips the model signals, so do their work here.
+    if document_model is Invoice:
+        payments.refresh_balance(pk)
+    elif document_model is PurchaseOrder:
+        received_on = (
+            PurchaseOrder.objects.filter(pk=pk, status="Received")
+            .values_list("date", flat=True)
+            .first()
+        )
+        if received_on:
+            rollups.apply((received_on, {"purchases_total": amount, "purchase_order_count": 0}))
+    transaction.on_commit(kpis.invalidate)
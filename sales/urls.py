@@ -15,6 +15,7 @@ urlpatterns = [
 
     # MARK AS RECEIVED
     path("orders/<int:pk>/receive/", views.purchase_order_receive, name="purchase_order_receive"),
+    path("orders/receive/", views.purchase_order_receive_many, name="purchase_order_receive_many"),
 
     # PDF DOWNLOAD
     path("orders/<int:pk>/pdf/", views.purchase_order_pdf, name="purchase_order_pdf"),
@@ -25,10 +26,13 @@ urlpatterns = [
     path("purchases/quotations/create/", views.quotation_create, name="quotation_create"),
     path("purchases/quotations/<int:pk>/", views.quotation_detail, name="quotation_detail"),
     path("purchases/quotations/<int:pk>/to-invoice/", views.quotation_to_invoice, name="quotation_to_invoice"),
+    path("purchases/quotations/convert/", views.quotation_convert_many, name="quotation_convert_many"),
 
     # INVOICES
     path("purchases/invoices/", views.invoice_list, name="invoice_list"),
     path("purchases/invoices/<int:pk>/", views.invoice_detail, name="invoice_detail"),
+    path("purchases/invoices/export.zip", views.invoice_export_zip, name="invoice_export_zip"),
+    path("purchases/analytics/sales-facts/", views.sales_facts_export, name="sales_facts_export"),
 
     # RECEIPTS
     path("purchases/invoices/<int:pk>/receipt/create/", views.receipt_create, name="receipt_create"),
@@ -80,6 +84,9 @@ path(
     name="receipt_pdf"
 ),
 
+# BACKGROUND PDF JOBS
+path("pdf/jobs/<slug:key>/", views.pdf_job, name="pdf_job"),
+
 path("purchase-orders/<int:pk>/delete/", views.purchase_order_delete, name="purchase_order_delete"),
 path("quotations/<int:pk>/delete/", views.quotation_delete, name="quotation_delete"),
 path("invoices/<int:pk>/delete/", views.invoice_delete, name="invoice_delete"),
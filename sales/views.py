@@ -1,6 +1,8 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.http import urlencode
 from django.contrib import messages
 
 from .models import PurchaseOrder, PurchaseOrderItem
@@ -10,13 +12,14 @@ from .forms import PurchaseOrderForm, PurchaseOrderItemForm
 from django.contrib.staticfiles.storage import staticfiles_storage
 
 from django.template.loader import render_to_string
-from weasyprint import HTML
+from . import analytics, conversion, documents, pdf_cache, pdf_export, pdf_jobs, receiving, stock
 
 # PDF IMPORTS
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 
 
+from django.db import transaction
 from django.db.models import Sum
 from .models import (
     PurchaseOrder, PurchaseOrderItem,
@@ -28,9 +31,12 @@ from .forms import (
     PurchaseOrderForm, PurchaseOrderItemForm,
     QuotationForm, QuotationItemForm,
     InvoiceForm, InvoiceItemForm,
-    ReceiptForm,
 )
 from crm.models import Customer
+from core.pagination import json_page, paginate, wants_json
+from core.db_routers import reporting
+from core.querybudget import query_budget
+from .kpis import get_kpis
 
 
 
@@ -38,9 +44,22 @@ from crm.models import Customer
 # LIST OF PURCHASE ORDERS
 # --------------------------------------------------------
 @login_required
+@reporting
+@query_budget(5)
 def purchase_order_list(request):
-    orders = PurchaseOrder.objects.all().order_by("-date")
-    return render(request, "sales/po_list.html", {"orders": orders})
+    orders = paginate(request, PurchaseOrder.objects.select_related("supplier"))
+    if wants_json(request):
+        return json_page(orders, lambda po: {
+            "id": po.id,
+            "supplier": po.supplier.name,
+            "date": po.date,
+            "status": po.status,
+            "total_amount": po.total_amount,
+        })
+    return render(request, "sales/po_list.html", {
+        "orders": orders,
+        "statuses": PurchaseOrder._meta.get_field("status").choices,
+    })
 
 
 # --------------------------------------------------------
@@ -77,8 +96,7 @@ def purchase_order_create(request):
 @login_required
 def purchase_order_detail(request, pk):
     po = get_object_or_404(PurchaseOrder, pk=pk)
-    items = PurchaseOrderItem.objects.filter(purchase_order=po)
-    products = Product.objects.all()
+    items = PurchaseOrderItem.objects.filter(purchase_order=po).select_related("product")
 
     return render(
         request,
@@ -86,7 +104,6 @@ def purchase_order_detail(request, pk):
         {
             "po": po,
             "items": items,
-            "products": products,
         },
     )
 
@@ -104,11 +121,8 @@ def purchase_order_add_item(request, pk):
         if form.is_valid():
             item = form.save(commit=False)
             item.purchase_order = po
-            item.save()
-
-            # Update PO total
-            po.total_amount = po.calculate_total()
-            po.save()
+            with transaction.atomic():
+                item.save()  # total_amount follows via sales.totals
 
             messages.success(request, "Item added successfully!")
             return redirect("purchase_order_detail", pk=pk)
@@ -128,12 +142,9 @@ def purchase_order_add_item(request, pk):
 @login_required
 def purchase_order_delete_item(request, po_id, item_id):
     po = get_object_or_404(PurchaseOrder, pk=po_id)
-    item = get_object_or_404(PurchaseOrderItem, pk=item_id)
-    item.delete()
-
-    # Update totals
-    po.total_amount = sum(i.line_total for i in po.items.all())
-    po.save()
+    item = get_object_or_404(PurchaseOrderItem, pk=item_id, purchase_order=po)
+    with transaction.atomic():
+        item.delete()  # total_amount follows via sales.totals
 
     messages.warning(request, "Item removed.")
     return redirect("purchase_order_detail", pk=po_id)
@@ -144,25 +155,43 @@ def purchase_order_delete_item(request, po_id, item_id):
 # --------------------------------------------------------
 @login_required
 def purchase_order_receive(request, pk):
-    po = get_object_or_404(PurchaseOrder, pk=pk)
+    get_object_or_404(PurchaseOrder, pk=pk)
+
+    try:
+        received = receiving.receive([pk])
+    except receiving.ReceiveConflict:
+        received = []
 
-    if po.status == "Received":
+    if not received:
         messages.info(request, "Purchase Order already received.")
         return redirect("purchase_order_detail", pk=pk)
 
-    # update stock
-    for item in po.items.all():
-        product = item.product
-        product.stock += item.quantity
-        product.save()
-
-    po.status = "Received"
-    po.save()
-
     messages.success(request, "Inventory updated successfully.")
     return redirect("purchase_order_detail", pk=pk)
 
 
+@login_required
+def purchase_order_receive_many(request):
+    """Receive every purchase order ticked on the list page (delivery days)."""
+    if request.method != "POST":
+        return redirect("purchase_order_list")
+
+    ids = [int(i) for i in request.POST.getlist("ids") if i.isdigit()]
+    try:
+        received = receiving.receive(ids)
+    except receiving.ReceiveConflict:
+        messages.error(request, "Some of these purchase orders were just received by someone else. Nothing was changed, please try again.")
+        return redirect("purchase_order_list")
+
+    if received:
+        numbers = ", ".join(f"#{po.id}" for po in received)
+        messages.success(request, f"Received {len(received)} purchase order(s): {numbers}. Inventory updated.")
+    skipped = len(set(ids)) - len(received)
+    if skipped:
+        messages.info(request, f"{skipped} purchase order(s) were already received or not found.")
+    return redirect("purchase_order_list")
+
+
 # --------------------------------------------------------
 # DOWNLOAD PURCHASE ORDER AS PDF
 # --------------------------------------------------------
@@ -175,35 +204,35 @@ def purchase_order_pdf(request, pk):
         staticfiles_storage.url("img/logo.png")
     )
 
-    company = {
-        "name": "Ed-Tech Africa Innovation College",
-        "address": "Barclays House, Main Mall, Gaborone, Botswana",
-        "phone": "+267 71 234 567",
-        "email": "info@edtechafrica.co.bw",
-    }
-
-    return render(request, "sales/po_pdf.html", {
+    context = {
         "po": po,
         "items": items,
         "logo_url": logo_url,
-        "company": company,
-    })
+        "company": documents.COMPANY,
+    }
+
+    # The printable HTML page by default; ?async=1 renders a real PDF
+    # in the background worker pool.
+    if pdf_jobs.wants_async(request):
+        html = render_to_string("sales/po_pdf.html", context, request=request)
+        return _pdf_response(request, html, filename=f"PO-{po.id:04d}.pdf")
+
+    return render(request, "sales/po_pdf.html", context)
 
 # --------------------------------------------------------
 # SALES DOCUMENTS DASHBOARD (Purchases tab)
 # --------------------------------------------------------
 @login_required
+@reporting
+@query_budget(8)
 def sales_documents_dashboard(request):
-    total_quotations = Quotation.objects.count()
-    total_invoices = Invoice.objects.count()
-    total_receipts = Receipt.objects.count()
-    total_sales = Receipt.objects.aggregate(total=Sum("amount_paid"))["total"] or 0
+    kpis = get_kpis()
 
     return render(request, "sales/purchases_dashboard.html", {
-        "total_quotations": total_quotations,
-        "total_invoices": total_invoices,
-        "total_receipts": total_receipts,
-        "total_sales": total_sales,
+        "total_quotations": kpis["total_quotations"],
+        "total_invoices": kpis["total_invoices"],
+        "total_receipts": kpis["total_receipts"],
+        "total_sales": kpis["total_sales"],
     })
 
 
@@ -211,9 +240,23 @@ def sales_documents_dashboard(request):
 # QUOTATIONS
 # --------------------------------------------------------
 @login_required
+@reporting
+@query_budget(5)
 def quotation_list(request):
-    quotations = Quotation.objects.select_related("customer").order_by("-date")
-    return render(request, "sales/quotation_list.html", {"quotations": quotations})
+    quotations = paginate(request, Quotation.objects.select_related("customer"))
+    if wants_json(request):
+        return json_page(quotations, lambda q: {
+            "id": q.id,
+            "number": q.number,
+            "customer": q.customer.name,
+            "date": q.date,
+            "status": q.status,
+            "total_amount": q.total_amount,
+        })
+    return render(request, "sales/quotation_list.html", {
+        "quotations": quotations,
+        "statuses": Quotation.STATUS_CHOICES,
+    })
 
 
 @login_required
@@ -237,12 +280,10 @@ def quotation_create(request):
 def quotation_detail(request, pk):
     quotation = get_object_or_404(Quotation, pk=pk)
     items = quotation.items.select_related("product")
-    products = Product.objects.all()  # needed for dropdown
 
     return render(request, "sales/quotation_detail.html", {
         "quotation": quotation,
         "items": items,
-        "products": products,
     })
 
 
@@ -251,34 +292,66 @@ def quotation_detail(request, pk):
 def quotation_to_invoice(request, pk):
     quotation = get_object_or_404(Quotation, pk=pk)
 
-    invoice = Invoice.objects.create(
-        customer=quotation.customer,
-        quotation=quotation,
-        total_amount=quotation.total_amount,
-    )
-
-    for qi in quotation.items.all():
-        InvoiceItem.objects.create(
-            invoice=invoice,
-            product=qi.product,
-            quantity=qi.quantity,
-            price=qi.price,
-        )
+    try:
+        invoice, created = conversion.convert(quotation)
+    except stock.InsufficientStock as e:
+        messages.error(request, f"Not enough stock, no invoice created. {e}")
+        return redirect("quotation_detail", pk=pk)
 
-    messages.success(request, f"Invoice {invoice.number} created from quotation.")
+    if created:
+        messages.success(request, f"Invoice {invoice.number} created from quotation.")
+    else:
+        messages.info(request, f"Quotation already converted to invoice {invoice.number}.")
     return redirect("invoice_detail", pk=invoice.id)
 
 
+@login_required
+def quotation_convert_many(request):
+    """Convert every Accepted quotation ticked on the list page."""
+    if request.method != "POST":
+        return redirect("quotation_list")
+
+    ids = [int(i) for i in request.POST.getlist("ids") if i.isdigit()]
+    quotations = Quotation.objects.filter(pk__in=ids, status="Accepted")
+    try:
+        created, existing = conversion.convert_many(quotations)
+    except stock.InsufficientStock as e:
+        messages.error(request, f"Not enough stock, no invoices created. {e}")
+        return redirect("quotation_list")
+
+    if created:
+        numbers = ", ".join(invoice.number for invoice in created)
+        messages.success(request, f"Created {len(created)} invoice(s): {numbers}.")
+    if existing:
+        messages.info(request, f"{len(existing)} quotation(s) were already converted.")
+    skipped = len(set(ids)) - len(created) - len(existing)
+    if skipped:
+        messages.warning(request, f"{skipped} quotation(s) skipped: only Accepted quotations are converted.")
+    return redirect("quotation_list")
+
+
 # --------------------------------------------------------
 # INVOICES
 # --------------------------------------------------------
 @login_required
+@reporting
+@query_budget(5)
 def invoice_list(request):
-    invoices = Invoice.objects.select_related("customer").order_by("-date")
+    invoices = paginate(request, Invoice.objects.select_related("customer"))
+    if wants_json(request):
+        return json_page(invoices, lambda inv: {
+            "id": inv.id,
+            "number": inv.number,
+            "customer": inv.customer.name,
+            "date": inv.date,
+            "status": inv.status,
+            "total_amount": inv.total_amount,
+        })
     return render(request, "sales/invoice_list.html", {"invoices": invoices})
 
 
 @login_required
+@query_budget(10)
 def invoice_detail(request, pk):
     invoice = get_object_or_404(Invoice, pk=pk)
     items = invoice.items.select_related("product")
@@ -295,37 +368,20 @@ def invoice_detail(request, pk):
 # RECEIPTS (ACTUAL SALES)
 # --------------------------------------------------------
 @login_required
-def receipt_create(request, pk):
-    invoice = get_object_or_404(Invoice, pk=pk)
-
-    if request.method == "POST":
-        form = ReceiptForm(request.POST)
-        if form.is_valid():
-            receipt = form.save(commit=False)
-            receipt.invoice = invoice
-            receipt.save()
-
-            # Update invoice status based on receipts
-            if invoice.balance_due() <= 0:
-                invoice.status = "Paid"
-            else:
-                invoice.status = "Partially Paid"
-            invoice.save()
-
-            messages.success(request, f"Receipt {receipt.number} created.")
-            return redirect("invoice_detail", pk=invoice.id)
-    else:
-        form = ReceiptForm(initial={"amount_paid": invoice.balance_due()})
-
-    return render(request, "sales/receipt_create.html", {
-        "invoice": invoice,
-        "form": form,
-    })
-
-
-@login_required
+@reporting
+@query_budget(5)
 def receipt_list(request):
-    receipts = Receipt.objects.select_related("invoice", "invoice__customer").order_by("-date")
+    receipts = paginate(request, Receipt.objects.select_related("invoice", "invoice__customer"))
+    if wants_json(request):
+        return json_page(receipts, lambda r: {
+            "id": r.id,
+            "number": r.number,
+            "invoice": r.invoice.number,
+            "customer": r.invoice.customer.name,
+            "date": r.date,
+            "amount_paid": r.amount_paid,
+            "payment_method": r.payment_method,
+        })
     return render(request, "sales/receipt_list.html", {"receipts": receipts})
 
 
@@ -333,44 +389,22 @@ def receipt_list(request):
 # SALES SUMMARY (TOTAL ACTUAL SALES)
 # --------------------------------------------------------
 @login_required
+@reporting
+@query_budget(10)
 def sales_summary(request):
-    total_sales = Receipt.objects.aggregate(total=Sum("amount_paid"))["total"] or 0
-    total_invoices = Invoice.objects.count()
-    total_customers = Customer.objects.count()
+    kpis = get_kpis()
 
-    receipts = Receipt.objects.select_related("invoice", "invoice__customer").order_by("-date")[:20]
+    receipts = Receipt.objects.select_related("invoice", "invoice__customer").order_by("-date", "-id")[:20]
 
     return render(request, "sales/sales_summary.html", {
-        "total_sales": total_sales,
-        "total_invoices": total_invoices,
-        "total_customers": total_customers,
+        "total_sales": kpis["total_sales"],
+        "total_invoices": kpis["total_invoices"],
+        "total_customers": kpis["total_customers"],
         "recent_receipts": receipts,
     })
     
-@login_required
-def quotation_convert_to_invoice(request, pk):
-    quotation = get_object_or_404(Quotation, pk=pk)
-
-    # Create invoice
-    invoice = Invoice.objects.create(
-        customer=quotation.customer,
-        quotation=quotation,
-        status="Unpaid",
-        total_amount=quotation.total_amount
-    )
-
-    # Copy items from quotation → invoice
-    for item in quotation.items.all():
-        InvoiceItem.objects.create(
-            invoice=invoice,
-            product=item.product,
-            quantity=item.quantity,
-            price=item.price  # <-- IMPORTANT
-        )
-
-    messages.success(request, "Quotation converted to Invoice successfully!")
-
-    return redirect("invoice_detail", pk=invoice.id)
+# Older URL for the same conversion (sales.conversion)
+quotation_convert_to_invoice = quotation_to_invoice
 
 
 @login_required
@@ -384,17 +418,14 @@ def quotation_add_item(request, pk):
 
         product = get_object_or_404(Product, id=product_id)
 
-        # Create item correctly
-        QuotationItem.objects.create(
-            quotation=quotation,
-            product=product,
-            quantity=quantity,
-            price=price,  # <-- correct model field
-        )
-
-        # Update totals
-        quotation.total_amount = quotation.calculate_total()
-        quotation.save()
+        # Create item correctly; total_amount follows via sales.totals
+        with transaction.atomic():
+            QuotationItem.objects.create(
+                quotation=quotation,
+                product=product,
+                quantity=quantity,
+                price=price,  # <-- correct model field
+            )
 
         messages.success(request, "Item added to quotation.")
         return redirect("quotation_detail", pk=pk)
@@ -405,13 +436,10 @@ def quotation_add_item(request, pk):
 @login_required
 def quotation_delete_item(request, pk, item_id):
     quotation = get_object_or_404(Quotation, pk=pk)
-    item = get_object_or_404(QuotationItem, pk=item_id)
-
-    item.delete()
+    item = get_object_or_404(QuotationItem, pk=item_id, quotation=quotation)
 
-    # Update totals
-    quotation.total_amount = quotation.calculate_total()
-    quotation.save()
+    with transaction.atomic():
+        item.delete()  # total_amount follows via sales.totals
 
     messages.warning(request, "Item removed from quotation.")
     return redirect("quotation_detail", pk=pk)
@@ -431,10 +459,7 @@ def receipt_create(request, pk):
             payment_method=payment_method,
             notes=notes
         )
-
-        # Update invoice totals
-        invoice.total_amount = invoice.calculate_total()
-        invoice.save()
+        # amount_received / balance_due / status follow via sales.signals
 
         messages.success(request, "Payment recorded successfully!")
         return redirect("invoice_detail", pk=pk)
@@ -442,71 +467,99 @@ def receipt_create(request, pk):
     return render(request, "sales/receipt_create.html", {"invoice": invoice})
 
 
+# --------------------------------------------------------
+# PDF DOWNLOADS (cached, optionally rendered in the background)
+# --------------------------------------------------------
+def _pdf_response(request, html, filename):
+    if not pdf_jobs.wants_async(request):
+        return pdf_cache.pdf_response(request, html, filename=filename)
+
+    try:
+        key = pdf_jobs.submit(html)
+    except pdf_jobs.QueueFull:
+        response = JsonResponse({"status": "busy"}, status=503)
+        response.headers["Retry-After"] = "5"
+        return response
+
+    return _pdf_job_status(key, filename)
+
+
+def _pdf_job_status(key, filename):
+    status = pdf_jobs.status(key)
+    url = f"{reverse('pdf_job', args=[key])}?{urlencode({'filename': filename})}"
+    data = {"job": key, "status": status, "url": url}
+
+    if status == "failed":
+        data["error"] = pdf_jobs.error(key)
+        return JsonResponse(data, status=500)
+    if not pdf_jobs.KEY_RE.match(key):
+        return JsonResponse(data, status=404)
+    return JsonResponse(data, status=200 if status == "ready" else 202)
+
+
+@login_required
+def pdf_job(request, key):
+    """Poll a background PDF job; returns the PDF itself once it is ready."""
+    filename = request.GET.get("filename") or f"{key[:12]}.pdf"
+
+    if pdf_jobs.status(key) == "ready" and request.GET.get("download") != "0":
+        return pdf_cache.file_response(request, key, filename=filename)
+    return _pdf_job_status(key, filename)
+
+
 @login_required
 def quotation_pdf(request, pk):
     quotation = get_object_or_404(Quotation, pk=pk)
 
-    html = render_to_string(
-        "sales/pdf/quotation.html",
-        {
-            "quotation": quotation,
-            "company": {
-                "name": "Ed-Tech Africa Innovation College",
-                "address": "Barclays House, Main Mall, Gaborone, Botswana",
-                "phone": "+267 71 234 567",
-                "email": "info@edtechafrica.co.bw",
-            },
-            "title": "QUOTATION",
-        }
-    )
+    html = documents.quotation_html(quotation)
 
-    pdf = HTML(string=html).write_pdf()
-    return HttpResponse(pdf, content_type="application/pdf")
+    return _pdf_response(request, html, filename=f"{quotation.number}.pdf")
 
 
 @login_required
 def invoice_pdf(request, pk):
     invoice = get_object_or_404(Invoice, pk=pk)
 
-    html = render_to_string(
-        "sales/pdf/invoice.html",
-        {
-            "invoice": invoice,
-            "company": {
-                "name": "Ed-Tech Africa Innovation College",
-                "address": "Barclays House, Main Mall, Gaborone, Botswana",
-                "phone": "+267 71 234 567",
-                "email": "info@edtechafrica.co.bw",
-            },
-            "title": "INVOICE",
-        }
-    )
+    html = documents.invoice_html(invoice)
 
-    pdf = HTML(string=html).write_pdf()
-    return HttpResponse(pdf, content_type="application/pdf")
+    return _pdf_response(request, html, filename=f"{invoice.number}.pdf")
 
 
 @login_required
 def receipt_pdf(request, invoice_id, receipt_id):
     receipt = get_object_or_404(Receipt, pk=receipt_id)
 
-    html = render_to_string(
-        "sales/pdf/receipt.html",
-        {
-            "receipt": receipt,
-            "invoice": receipt.invoice,
-            "company": {
-                "name": "Ed-Tech Africa Innovation College",
-                "address": "Barclays House, Main Mall, Gaborone, Botswana",
-                "phone": "+267 71 234 567",
-                "email": "info@edtechafrica.co.bw",
-            },
-            "title": "RECEIPT",
-        }
+    html = documents.receipt_html(receipt)
+
+    return _pdf_response(request, html, filename=f"{receipt.number}.pdf")
+
+
+@login_required
+@reporting
+def invoice_export_zip(request):
+    """All invoice/receipt PDFs for ?start=&end=&status= as one streamed ZIP."""
+    invoices, receipts = pdf_export.filter_documents(request.GET)
+
+    response = StreamingHttpResponse(
+        pdf_export.stream_zip(invoices, receipts), content_type="application/zip"
     )
+    response["Content-Disposition"] = f'attachment; filename="{pdf_export.export_filename(request.GET)}"'
+    return response
+
 
-    pdf = HTML(string=html).write_pdf()
-    return HttpResponse(pdf, content_type="application/pdf")
+@login_required
+def sales_facts_export(request):
+    """
+    GET: the Parquet sales facts manifest (months, rows, when written).
+    POST: bring the facts up to date (?full=1 rewrites every month).
+    """
+    if not analytics.available():
+        return JsonResponse({"error": "The sales facts export needs pyarrow installed."}, status=501)
+    if request.method == "POST":
+        result = analytics.export(full=bool(request.POST.get("full") or request.GET.get("full")))
+        return JsonResponse({"directory": str(analytics.directory()), **result})
+    manifest = analytics.read_manifest()
+    return JsonResponse({"directory": str(analytics.directory()), "months": manifest["months"]})
 
 
 @login_required